@@ -0,0 +1,122 @@
+"""Implements BitsetFeatures."""
+
+import numpy as np
+
+
+class BitsetFeatures:
+
+    """For storing binary features as packed bitsets.
+
+    Each binary (0 or 1) feature is stored as a bitset of one bit per data point, packed into 64 bit words, which is
+    64 times less memory than an int64 column. A set of data points, such as the data points of a node of a decision
+    tree, is stored as a bitset of the same layout, so the amount of data points of a set that have a feature value
+    of 1 is the popcount (number of set bits) of the AND of the two bitsets.
+
+    Attributes:
+        num_rows (int): The amount of data points.
+        bitsets (numpy.ndarray): The packed features, one row of uint64 words per feature.
+
+    Statics:
+        POPCOUNT_TABLE (numpy.ndarray): The popcount of each byte, used if numpy has no bitwise_count.
+
+    """
+
+    POPCOUNT_TABLE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int64)
+
+    def __init__(self):
+        """Set up BitsetFeatures.
+
+        Creates an empty feature store, which is filled by pack.
+
+        """
+        self.num_rows = 0
+        self.bitsets = np.zeros((0, 0), dtype=np.uint64)
+
+    def pack(self, feature_matrix):
+        """Pack binary features into bitsets.
+
+        Args:
+            feature_matrix (numpy.ndarray): Binary features, one row per data point, and one column per feature, where
+                any value other than 0 is a set bit.
+
+        Returns:
+            BitsetFeatures: self, with the packed features.
+
+        """
+        self.num_rows = len(feature_matrix)
+        self.bitsets = self.pack_columns(np.asarray(feature_matrix).T != 0)
+
+        return self
+
+    def pack_rows(self, mask):
+        """Pack a set of data points into a bitset.
+
+        Args:
+            mask (numpy.ndarray): A boolean array with one value per data point, True if the data point is in the set.
+
+        Returns:
+            numpy.ndarray: The bitset of the set, with the same layout as the bitset of a feature.
+
+        """
+        return self.pack_columns(np.asarray(mask, dtype=bool)[np.newaxis, :])[0]
+
+    @staticmethod
+    def pack_columns(masks):
+        """Pack rows of boolean values into rows of 64 bit words.
+
+        Args:
+            masks (numpy.ndarray): A boolean matrix, one row per bitset.
+
+        Returns:
+            numpy.ndarray: A matrix of uint64 words, one row per bitset, where the unused bits of the last word are 0.
+
+        """
+        # Pack 8 values per byte, and pad each row with 0 bytes to a multiple of 8 bytes
+        packed = np.packbits(masks, axis=1, bitorder="little")
+        padded = np.zeros((len(masks), -(-packed.shape[1] // 8) * 8), dtype=np.uint8)
+        padded[:, 0:packed.shape[1]] = packed
+
+        # View each 8 bytes as one 64 bit word
+        return padded.view(np.uint64)
+
+    def unpack_rows(self, bitset):
+        """Unpack a bitset of a set of data points.
+
+        Args:
+            bitset (numpy.ndarray): The bitset of a set of data points.
+
+        Returns:
+            numpy.ndarray: A boolean array with one value per data point, True if the data point is in the set.
+
+        """
+        return np.unpackbits(bitset.view(np.uint8), bitorder="little")[0:self.num_rows].astype(bool)
+
+    def popcount(self, bitsets):
+        """Count the set bits of bitsets.
+
+        Args:
+            bitsets (numpy.ndarray): Bitsets of uint64 words, where the words of a bitset are the last axis.
+
+        Returns:
+            numpy.ndarray or int: The number of set bits of each bitset.
+
+        """
+        # Use the popcount instruction if numpy has it, otherwise look up the popcount of each byte
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(bitsets).sum(axis=-1, dtype=np.int64)
+        return self.POPCOUNT_TABLE[bitsets.view(np.uint8)].sum(axis=-1)
+
+    def feature_counts(self, bitset, features=None):
+        """Count the data points of a set that have a feature value of 1, for each feature.
+
+        Args:
+            bitset (numpy.ndarray): The bitset of a set of data points.
+            features (list of int): The features to count, all of the features if None.
+
+        Returns:
+            numpy.ndarray: The amount of data points of the set that have a feature value of 1, for each feature.
+
+        """
+        # AND the set with each feature, and count the set bits
+        feature_bitsets = self.bitsets if features is None else self.bitsets[features]
+        return self.popcount(feature_bitsets & bitset)
@@ -0,0 +1,69 @@
+"""Implements ConvertSparse."""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class ConvertSparse:
+
+    """For converting dictionary features to a Scipy sparse matrix.
+
+    The ConvertSparse class contains useful functions to convert dictionary features, such as bag of words or
+    tf-idf dictionaries, to a sparse matrix where each row is a document and each column is a word.
+
+    """
+
+    @staticmethod
+    def convert_to_csr(features, vocabulary=None):
+        """Convert dictionary features to a csr matrix.
+
+        Convert a list of dictionaries (word to value) to one csr matrix, where row i is the i-th dictionary, and
+        the column of a word is given by the vocabulary. If no vocabulary is given, then the vocabulary is built
+        in the order that the words are encountered. If a vocabulary is given, then words that are not in the
+        vocabulary are ignored.
+
+        Args:
+            features (pandas.Series or list of dict): Bag of words or tf-idf dictionaries.
+            vocabulary (dict): A dictionary of word to column index.
+
+        Returns:
+            A tuple that contains a csr matrix, and the vocabulary:
+                (
+                    features_csr (scipy.sparse.csr_matrix): A matrix of the features, one row per dictionary.
+                    vocabulary (dict): A dictionary of word to column index.
+                )
+
+        """
+        # Build a new vocabulary if none is given, then new words will be added to the vocabulary
+        build_vocabulary = vocabulary is None
+        vocabulary = {} if build_vocabulary else vocabulary
+
+        # Store the column index and the value of each word, and the amount of words for each dictionary
+        columns = []
+        values = []
+        row_lengths = np.zeros(len(features) + 1, dtype=np.int64)
+
+        # Loop through each dictionary, and each word in the dictionary
+        for row, feature in enumerate(features):
+            for word, value in feature.items():
+                # Look up the column of the word, and add the word to the vocabulary if needed
+                if build_vocabulary:
+                    column = vocabulary.setdefault(word, len(vocabulary))
+                elif word in vocabulary:
+                    column = vocabulary[word]
+                else:
+                    continue
+
+                columns.append(column)
+                values.append(value)
+                row_lengths[row + 1] += 1
+
+        # The row pointers of a csr matrix are the cumulative sum of the amount of words per row
+        features_csr = csr_matrix((np.array(values, dtype=np.float64), np.array(columns, dtype=np.int64),
+                                   np.cumsum(row_lengths)), shape=(len(features), len(vocabulary)))
+
+        # A dictionary can only have a word once, but sum duplicates in case the vocabulary maps two words to
+        # the same column
+        features_csr.sum_duplicates()
+
+        return features_csr, vocabulary
@@ -0,0 +1,81 @@
+"""Implements CorpusReader."""
+
+import bz2
+import gzip
+import lzma
+import pandas as pd
+
+
+class CorpusReader:
+
+    """For reading a corpus in chunks of documents.
+
+    The CorpusReader reads a corpus from a (compressed) csv or text file as an iterator of chunks, where each chunk is
+    a Pandas.Series of at most chunk_size documents, so that the memory is bounded by the chunk size regardless of the
+    size of the corpus. Each chunk can be passed to any function of TextAnalytics that takes a corpus.
+
+    Attributes:
+        chunk_size (int): The maximum amount of documents in a chunk.
+
+    """
+
+    # Functions that open a compressed text file, by file extension
+    OPENERS = {".bz2": bz2.open, ".gz": gzip.open, ".xz": lzma.open, ".lzma": lzma.open}
+
+    def __init__(self, chunk_size=10000):
+        """Set up CorpusReader.
+
+        Args:
+            chunk_size (int): The maximum amount of documents in a chunk.
+
+        """
+        self.chunk_size = chunk_size
+
+    def read_csv(self, path, column):
+        """Read the documents of a csv file in chunks.
+
+        Only the column of the documents is read, and the compression (bz2, gzip, xz, zip) is inferred from the file
+        extension. Empty cells are read as empty documents.
+
+        Args:
+            path (str): Path of the csv file.
+            column (str): The column that contains the documents.
+
+        Yields:
+            Pandas.Series: A chunk of documents.
+
+        """
+        # Let pandas read the file in chunks, and only parse the column of the documents, where pandas reads empty
+        # cells as NaN, which can't be tokenized
+        for chunk in pd.read_csv(path, usecols=[column], chunksize=self.chunk_size):
+            yield chunk[column].fillna("")
+
+    def read_text(self, path, encoding="utf-8"):
+        """Read the documents of a text file in chunks, where each line is a document.
+
+        The file is decompressed while it's read if the file extension is .bz2, .gz, .xz or .lzma.
+
+        Args:
+            path (str): Path of the text file.
+            encoding (str): Encoding of the text file.
+
+        Yields:
+            Pandas.Series: A chunk of documents.
+
+        """
+        # Open the file with the decompressor that matches the file extension, or as a plain text file
+        opener = next((opener for extension, opener in self.OPENERS.items() if path.endswith(extension)), open)
+
+        with opener(path, "rt", encoding=encoding) as file:
+            documents = []
+
+            # Read each line without the line break, and yield the documents each time a chunk is full
+            for line in file:
+                documents.append(line.rstrip("\r\n"))
+                if len(documents) == self.chunk_size:
+                    yield pd.Series(documents)
+                    documents = []
+
+            # Yield the remaining documents
+            if documents:
+                yield pd.Series(documents)
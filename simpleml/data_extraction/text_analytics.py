@@ -1,36 +1,54 @@
 """Implements text analytics: word count, and TD-IDF."""
 
-import math
-from collections import defaultdict
+import zlib
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+import numpy as np
+from scipy.sparse import csr_matrix
+from data_extraction.tokenizer import Tokenizer
 
 
 class TextAnalytics:
 
     """For analyzes of text data.
 
-    Contains useful functions that can convert text data into numeric data.
+    Contains useful functions that can convert text data into numeric data. Every function splits text into words
+    with the same tokenizer.
 
     Attributes:
+        tokenizer (Tokenizer): Splits text into words.
         idf (dict): A dictionary of known idf values for faster lookup.
+        vocabulary (dict): A dictionary of word to index in document_frequency, built by fit.
+        document_frequency (numpy.array): The amount of documents that use each word, built by fit.
+        corpus_size (int): The amount of documents in the corpus, set by fit.
 
     """
 
-    def __init__(self):
+    def __init__(self, tokenizer=None):
         """Set up TextAnalytics.
 
-        Stores previous idf values for quicker lookup, no need to compute again.
+        Stores previous idf values for quicker lookup, no need to compute again, and the document frequency table
+        of the corpus that is built by fit.
+
+        Args:
+            tokenizer (Tokenizer): Splits text into words, the default Tokenizer splits on a single space.
 
         """
+        self.tokenizer = tokenizer if tokenizer is not None else Tokenizer()
         self.idf = {}
+        self.vocabulary = {}
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.corpus_size = 0
 
     @staticmethod
-    def word_count(text):
+    def word_count(text, tokenizer=None):
         """Compute the word count.
 
         Compute the word count vector by counting the number of occurrences for a word.
 
         Args:
             text (str): Text that needs to be converted to numeric vector. Assumes that the input is already cleaned.
+            tokenizer (Tokenizer): Splits text into words, the default Tokenizer splits on a single space.
 
         Returns:
             count (dict): A word count dictionary where the key are the word, and the values are the number of
@@ -41,12 +59,235 @@ class TextAnalytics:
         # AttributeError
         count = defaultdict(int)
 
-        # Split the text by spaces, and increment the count of the word
-        for word in text.split(" "):
+        # Split the text with the tokenizer, and increment the count of the word
+        for word in (tokenizer if tokenizer is not None else Tokenizer()).tokenize(text):
             count[word] += 1
 
         return count
 
+    def fit(self, corpus, processes=1):
+        """Compute the document frequency of every word in a corpus.
+
+        Tokenize each document of the corpus once, and count the number of documents that use each word, which
+        builds the document frequency table for all words, see count_corpus. Then the idf of every word is computed
+        from the table, hence          # docs
+                              log -----------------
+                                  # docs using word
+
+        Args:
+            corpus (Pandas.Series): A list of strings (documents).
+            processes (int): Amount of worker processes used to count the documents.
+
+        Returns:
+            TextAnalytics: self, fitted to the corpus.
+
+        """
+        # Start from an empty document frequency table, and add the whole corpus
+        self.reset()
+
+        return self.partial_fit(corpus, processes)
+
+    def reset(self):
+        """Reset the document frequency table, the vocabulary and the idf cache to an empty corpus."""
+        self.idf = {}
+        self.vocabulary = {}
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.corpus_size = 0
+
+    def partial_fit(self, corpus, processes=1, pool=None):
+        """Update the document frequency table with new documents.
+
+        Count the number of documents that use each word in the new documents, see count_corpus, and add the counts
+        to the document frequency table, and the amount of new documents to the corpus size, without refitting the
+        documents that were already fitted. New words are added to the end of the vocabulary, so the index of a
+        known word never changes. Then the idf of every word is recomputed.
+
+        Args:
+            corpus (Pandas.Series): A list of strings (new documents).
+            processes (int): Amount of worker processes used to count the documents.
+            pool (multiprocessing.Pool): A pool of processes worker processes to count with, see count_corpus.
+
+        Returns:
+            TextAnalytics: self, fitted to the previous documents and the new documents.
+
+        """
+        # Count the number of documents that use each word
+        _, document_frequency = self.count_corpus(corpus, processes, pool)
+
+        # Add the new words to the vocabulary, in the order that the words are first seen in the corpus
+        for word in document_frequency:
+            self.vocabulary.setdefault(word, len(self.vocabulary))
+
+        # Grow the document frequency table to the new vocabulary, and add the counts of the new documents
+        updated_document_frequency = np.zeros(len(self.vocabulary), dtype=np.int64)
+        updated_document_frequency[0:len(self.document_frequency)] = self.document_frequency
+        updated_document_frequency[np.fromiter([self.vocabulary[word] for word in document_frequency],
+                                               dtype=np.int64, count=len(document_frequency))] += \
+            np.fromiter(document_frequency.values(), dtype=np.int64, count=len(document_frequency))
+        self.document_frequency = updated_document_frequency
+        self.corpus_size += len(corpus)
+
+        # Compute the idf of every word, and update our cache
+        self.update_idf()
+
+        return self
+
+    def fit_stream(self, chunks, processes=1):
+        """Compute the document frequency of every word in a corpus that is read in chunks.
+
+        Fit the corpus in one pass over the chunks, where each chunk is added to the document frequency table with
+        partial_fit, so only one chunk is in memory at a time. The result is the same as fitting the whole corpus
+        at once. The worker processes are started once, and count every chunk.
+
+        Args:
+            chunks (iterable of Pandas.Series): Chunks of documents, for example from CorpusReader.
+            processes (int): Amount of worker processes used to count each chunk.
+
+        Returns:
+            TextAnalytics: self, fitted to the corpus.
+
+        """
+        # Start from an empty document frequency table
+        self.reset()
+
+        # Count in the current process if there's only one process
+        if processes == 1:
+            for chunk in chunks:
+                self.partial_fit(chunk)
+            return self
+
+        # Add each chunk to the table, where every chunk is counted by the same worker processes
+        with Pool(processes) as pool:
+            for chunk in chunks:
+                self.partial_fit(chunk, processes, pool)
+
+        return self
+
+    def update_idf(self):
+        """Compute the idf of every word from the document frequency table.
+
+        Compute the idf of every word in the vocabulary, and replace our cache,
+        hence          # docs
+              log -----------------
+                  # docs using word
+
+        """
+        self.idf = dict(zip(self.vocabulary, np.log(float(self.corpus_size) / self.document_frequency).tolist()))
+
+    def save(self, path):
+        """Save the document frequency table to a binary file.
+
+        The file is made of a header, followed by arrays that can be memory mapped:
+            1. Header: 3 int64, the corpus size, the vocabulary size V, and the amount of bytes of the words.
+            2. Word offsets: V+1 int64, word i is stored in bytes offsets[i] to offsets[i+1] of the words.
+            3. Document frequency: V int64.
+            4. Words: The utf-8 encoded words of the vocabulary, in the order of their index.
+
+        Args:
+            path (str): Path of the file.
+
+        """
+        # Encode each word in the order of the vocabulary, and compute where each word starts and ends
+        encoded_words = [word.encode("utf-8") for word in self.vocabulary]
+        offsets = np.zeros(len(encoded_words) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(word) for word in encoded_words])
+
+        # Write the header and each array
+        with open(path, "wb") as file:
+            file.write(np.array([self.corpus_size, len(encoded_words), offsets[-1]], dtype=np.int64).tobytes())
+            file.write(offsets.tobytes())
+            file.write(self.document_frequency.astype(np.int64).tobytes())
+            file.write(b"".join(encoded_words))
+
+    def load(self, path):
+        """Load a document frequency table from a binary file.
+
+        Memory maps the file that was created by save, where the document frequency table is used directly from
+        the memory map, and the vocabulary and the idf cache are rebuilt from the file. The document frequency table
+        is copied if it's updated with partial_fit.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            TextAnalytics: self, with the loaded document frequency table.
+
+        """
+        # Read the header
+        corpus_size, vocabulary_size, words_size = np.memmap(path, dtype=np.int64, mode="r", shape=(3,))
+
+        # Memory map the word offsets and the document frequency table, which follow the header, where an empty
+        # table can't be memory mapped, since it ends at the end of the file
+        offsets = np.memmap(path, dtype=np.int64, mode="r", offset=3 * 8, shape=(vocabulary_size + 1,))
+        self.document_frequency = np.memmap(path, dtype=np.int64, mode="r", offset=(vocabulary_size + 4) * 8,
+                                            shape=(vocabulary_size,)) if vocabulary_size \
+            else np.zeros(0, dtype=np.int64)
+
+        # Decode each word of the vocabulary, where the words follow the document frequency table
+        words = np.memmap(path, dtype=np.uint8, mode="r", offset=(2 * vocabulary_size + 4) * 8,
+                          shape=(words_size,)).tobytes() if words_size else b""
+        offsets = offsets.tolist()
+        self.vocabulary = {words[offsets[index]:offsets[index + 1]].decode("utf-8"): index
+                           for index in range(vocabulary_size)}
+        self.corpus_size = int(corpus_size)
+
+        # Compute the idf of every word
+        self.update_idf()
+
+        return self
+
+    def count_corpus(self, corpus, processes=1, pool=None):
+        """Count the words of a corpus with worker processes.
+
+        Split the corpus into one shard per process, and count the words of each shard in a worker process with
+        count_words, then merge the counts of the shards in order. The merged counts are the same regardless of
+        the amount of processes.
+
+        Args:
+            corpus (Pandas.Series): A list of strings (documents).
+            processes (int): Amount of worker processes, where 1 counts in the current process.
+            pool (multiprocessing.Pool): A pool of processes worker processes to count with, which is reused by
+                the caller, for example for every chunk of fit_stream. If None, a pool is started for this corpus.
+
+        Returns:
+            A tuple of two counters, where the words are in the order that they are first seen in the corpus:
+                (
+                    word_count (collections.Counter): The number of occurrences for each word.
+                    document_frequency (collections.Counter): The number of documents that use each word.
+                )
+
+        Raises:
+            ValueError: If processes is not a positive integer.
+
+        """
+        # At least one process is needed to count
+        if processes is None or processes < 1:
+            raise ValueError("The amount of processes must be at least 1, got {}".format(processes))
+
+        # Count in the current process if there's only one process, or nothing to count
+        documents = list(corpus)
+        if processes == 1 or not documents:
+            return count_words(self.tokenizer, documents)
+
+        # Split the corpus into one shard per process, where each shard has at least one document
+        shard_size = max(1, -(-len(documents) // processes))
+        shards = [documents[start:start + shard_size] for start in range(0, len(documents), shard_size)]
+
+        # Start a pool for this corpus if the caller didn't give one
+        if pool is None:
+            with Pool(processes) as corpus_pool:
+                return self.count_corpus(documents, processes, corpus_pool)
+
+        # Count each shard in a worker process, and merge the counts in the order of the shards
+        word_count = Counter()
+        document_frequency = Counter()
+        for shard_word_count, shard_document_frequency in pool.starmap(count_words,
+                                                                       [(self.tokenizer, shard) for shard in shards]):
+            word_count.update(shard_word_count)
+            document_frequency.update(shard_document_frequency)
+
+        return word_count, document_frequency
+
     def tf_idf(self, corpus, document):
         """Compute tf_idf.
 
@@ -56,38 +297,33 @@ class TextAnalytics:
                                       # docs using word
         We then can compute tf idf using tf*idf, this value is applicable for only one document.
 
+        The idf values are looked up from the document frequency table, which is built once by fit if the
+        corpus was not fitted yet. The corpus is only used for that first fit, later calls use the fitted table, so
+        call fit again to use a different corpus. Words of the document that are not in the fitted vocabulary are
+        skipped.
+
         Args:
-            corpus (Pandas.Series): A list of strings (documents).
+            corpus (Pandas.Series): A list of strings (documents), only used if the corpus was not fitted yet.
             document (str): A word document in str format.
 
         Returns:
             tf_idf (dict) : A dictionary of word and corresponding tf idf value.
 
         """
+        # Build the document frequency table of the corpus if it was not built yet
+        if not self.vocabulary:
+            self.fit(corpus)
+
         # Compute the word count
-        word_count = self.word_count(document)
+        word_count = TextAnalytics.word_count(document, self.tokenizer)
 
         # Create a default dictionary, where the default values are float
         idf = defaultdict(float)
 
-        # Split each word in the document
-        for word in document.split(" "):
-            # Check if the word already exist in our cache, so we don't need to recompute again
-            try:
+        # Split each word in the document, and look up the idf of the word, where unknown words are skipped
+        for word in self.tokenizer.tokenize(document):
+            if word in self.idf:
                 idf[word] = self.idf[word]
-            except KeyError:
-                # Corpus is a pandas.Series that has a contains functions that allows regular expression. The \b
-                # that wraps around the word would only match word, so it would not match apple with pineapple
-                word_appearance = sum(corpus.str.contains(r'\b{}\b'.format(word)))
-
-                # Compute the idf of the word, which is
-                #         # docs
-                # log -----------------
-                #     # docs using word
-                idf[word] = math.log(float(len(corpus)) / float(word_appearance))
-
-                # Update our cache
-                self.idf[word] = idf[word]
 
         # Compute the tf idf of the word by multiplying the word_count with idf
         tf_idf = defaultdict(float)
@@ -95,3 +331,181 @@ class TextAnalytics:
             tf_idf[word] = word_count[word] * idf[word]
 
         return tf_idf
+
+    def tf_idf_matrix(self, corpus):
+        """Compute tf_idf for every document of a corpus as a sparse matrix.
+
+        Compute the tf_idf of every document at once, where row i is the i-th document of the corpus, and the
+        column of a word is given by the vocabulary, so that the matrix can be used directly by sparse algorithms
+        such as NearestNeighbor. Words that are not in the vocabulary are ignored. The corpus is fitted first if
+        the corpus was not fitted yet.
+
+        The word counts are accumulated in arrays of word indices, instead of a dictionary per document, and then
+        multiplied by the idf of each word.
+
+        Args:
+            corpus (Pandas.Series): A list of strings (documents).
+
+        Returns:
+            tf_idf (scipy.sparse.csr_matrix): A matrix of tf idf values, one row per document, and one column per
+                word in the vocabulary.
+
+        """
+        # Build the document frequency table of the corpus if it was not built yet
+        if not self.vocabulary:
+            self.fit(corpus)
+
+        # Store the word index of every word in the corpus, and the amount of words of each document
+        word_indices = []
+        document_lengths = np.zeros(len(corpus), dtype=np.int64)
+
+        # Split each document, and look up the index of each word, where unknown words are -1
+        for row, document in enumerate(corpus):
+            words = self.tokenizer.tokenize(document)
+            word_indices.extend([self.vocabulary.get(word, -1) for word in words])
+            document_lengths[row] = len(words)
+
+        # Each word belongs to the row of its document, and remove the unknown words
+        word_indices = np.array(word_indices, dtype=np.int64)
+        rows = np.repeat(np.arange(len(corpus)), document_lengths)
+        known = word_indices >= 0
+
+        # Create the word count matrix, where repeated (row, word) entries are summed, which is the word count
+        tf_idf = csr_matrix((np.ones(np.count_nonzero(known)), (rows[known], word_indices[known])),
+                            shape=(len(corpus), len(self.vocabulary)))
+
+        # Multiply each word count by the idf of the word, tf*idf
+        tf_idf.data *= np.log(float(self.corpus_size) / self.document_frequency)[tf_idf.indices]
+
+        # Words that are used by every document have an idf of 0, which don't need to be stored
+        tf_idf.eliminate_zeros()
+
+        return tf_idf
+
+    def tf_idf_matrix_stream(self, chunks):
+        """Compute tf_idf for a corpus that is read in chunks.
+
+        Transform the corpus in one pass over the chunks, where the tf_idf of each chunk is computed with
+        tf_idf_matrix and yielded, so only one chunk is in memory at a time. The document frequency table must be
+        fitted first, for example with a first pass of fit_stream, since the idf of a word depends on the whole
+        corpus. The table is checked when the stream is created, not when the first chunk is read.
+
+        Args:
+            chunks (iterable of Pandas.Series): Chunks of documents, for example from CorpusReader.
+
+        Returns:
+            generator of scipy.sparse.csr_matrix: A matrix of tf idf values for each chunk, one row per document, and
+                one column per word in the vocabulary.
+
+        Raises:
+            ValueError: If the document frequency table is not fitted.
+
+        """
+        # A chunk can't be used to fit the table, since the idf would only be based on that chunk
+        if not self.vocabulary:
+            raise ValueError("The document frequency table must be fitted before transforming a stream")
+
+        return (self.tf_idf_matrix(chunk) for chunk in chunks)
+
+    @staticmethod
+    def hash_word(word, n_features, signed=False):
+        """Hash a word to a column.
+
+        Hash a word with crc32, which is the same in every process (unlike python's hash), and map the hash to one
+        of n_features columns. With signed hashing, the sign is taken from the highest bit of the hash, so that
+        words that collide in a column tend to cancel out instead of adding up.
+
+        Args:
+            word (str): A word.
+            n_features (int): The amount of columns.
+            signed (bool): Whether to compute a sign for the word.
+
+        Returns:
+            A tuple of the column and sign:
+                (
+                    int: The column of the word.
+                    int: 1 or -1, always 1 if signed is False.
+                )
+
+        """
+        # Compute the 32 bit hash of the word
+        word_hash = zlib.crc32(word.encode("utf-8"))
+
+        # The column is the hash modulo the amount of columns, and the sign is the highest bit of the hash
+        return word_hash % n_features, -1 if signed and word_hash >> 31 else 1
+
+    def hashing_matrix(self, corpus, n_features=2 ** 20, signed=False):
+        """Compute word counts for every document of a corpus with the hashing trick.
+
+        Compute the word count of every document at once, where row i is the i-th document of the corpus, and the
+        column of a word is given by hash_word instead of a vocabulary. No vocabulary is stored, so the memory is
+        bounded by n_features regardless of the amount of distinct words, documents can be transformed as they
+        stream in, and different processes can transform parts of a corpus without sharing any state.
+
+        Args:
+            corpus (Pandas.Series): A list of strings (documents).
+            n_features (int): The amount of columns.
+            signed (bool): Whether each word count is multiplied by the sign of the word, see hash_word.
+
+        Returns:
+            word_count (scipy.sparse.csr_matrix): A matrix of hashed word counts, one row per document, and
+                n_features columns.
+
+        """
+        # Store the hash of each distinct word, since a word always hashes to the same column and sign
+        hashes = {}
+
+        # Store the column and sign of every word in the corpus, and the amount of words of each document
+        columns = []
+        signs = []
+        document_lengths = np.zeros(len(corpus), dtype=np.int64)
+
+        # Split each document, and hash each word
+        for row, document in enumerate(corpus):
+            words = self.tokenizer.tokenize(document)
+            for word in words:
+                if word not in hashes:
+                    hashes[word] = self.hash_word(word, n_features, signed)
+                columns.append(hashes[word][0])
+                signs.append(hashes[word][1])
+            document_lengths[row] = len(words)
+
+        # Create the word count matrix, where repeated (row, column) entries are summed
+        word_count = csr_matrix((np.array(signs, dtype=np.float64),
+                                 (np.repeat(np.arange(len(corpus)), document_lengths),
+                                  np.array(columns, dtype=np.int64))),
+                                shape=(len(corpus), n_features))
+
+        # Signed collisions can cancel out, which don't need to be stored
+        word_count.eliminate_zeros()
+
+        return word_count
+
+
+def count_words(tokenizer, documents):
+    """Count the words of documents.
+
+    Used by TextAnalytics.count_corpus to count the words of a shard of a corpus in a worker process.
+
+    Args:
+        tokenizer (Tokenizer): Splits text into words.
+        documents (list of str): Documents to count.
+
+    Returns:
+        A tuple of two counters, where the words are in the order that they are first seen in the documents:
+            (
+                word_count (collections.Counter): The number of occurrences for each word.
+                document_frequency (collections.Counter): The number of documents that use each word.
+            )
+
+    """
+    word_count = Counter()
+    document_frequency = Counter()
+
+    # Split each document, and count every word, and each distinct word of the document once
+    for document in documents:
+        words = tokenizer.tokenize(document)
+        word_count.update(words)
+        document_frequency.update(dict.fromkeys(words, 1))
+
+    return word_count, document_frequency
@@ -0,0 +1,60 @@
+"""Implements Tokenizer."""
+
+import re
+
+
+class Tokenizer:
+
+    """For splitting text into words.
+
+    The Tokenizer splits text into words by a separator or a regular expression, and can lowercase the text and
+    remove stop words, so that the same tokenization is applied to every document of a corpus.
+
+    Attributes:
+        separator (str or NoneType): The separator between words, where None splits on any whitespace.
+        pattern (re.Pattern or NoneType): A regular expression that matches words, used instead of separator.
+        lowercase (bool): Flag that indicates if the text is lowercased before it's split.
+        stop_words (frozenset): Words that are removed after splitting.
+
+    """
+
+    def __init__(self, separator=" ", pattern=None, lowercase=False, stop_words=None):
+        """Set up Tokenizer.
+
+        The default tokenizer splits on a single space, which assumes that the text is already cleaned.
+
+        Args:
+            separator (str or NoneType): The separator between words, where None splits on any whitespace.
+            pattern (str or NoneType): A regular expression that matches words, used instead of separator if given,
+                for example "[a-z]+".
+            lowercase (bool): Flag that indicates if the text is lowercased before it's split.
+            stop_words (list of str or NoneType): Words that are removed after splitting.
+
+        """
+        self.separator = separator
+        self.pattern = re.compile(pattern) if pattern is not None else None
+        self.lowercase = lowercase
+        self.stop_words = frozenset(stop_words) if stop_words is not None else frozenset()
+
+    def tokenize(self, text):
+        """Split text into words.
+
+        Args:
+            text (str): Text to split.
+
+        Returns:
+            words (list of str): The words of the text in order.
+
+        """
+        # Lowercase the text before splitting, so that stop words are matched in lowercase
+        if self.lowercase:
+            text = text.lower()
+
+        # Find the words with the regular expression, otherwise split by the separator
+        words = self.pattern.findall(text) if self.pattern is not None else text.split(self.separator)
+
+        # Remove the stop words
+        if self.stop_words:
+            words = [word for word in words if word not in self.stop_words]
+
+        return words
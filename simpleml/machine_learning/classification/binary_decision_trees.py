@@ -1,5 +1,9 @@
 """Implements BinaryDecisionTrees."""
 
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from data_extraction.bitset_features import BitsetFeatures
+
 
 class BinaryDecisionTrees:
 
@@ -242,6 +246,594 @@ class BinaryDecisionTrees:
         return self.create_node(splitting_feature=splitting_feature, left=left_tree, right=right_tree, is_leaf=False,
                                 prediction=None)
 
+    def greedy_iterative(self, data, features, target, model_parameters):
+        """Greedy iterative approach to build a binary decision tree.
+
+        Builds the same tree as greedy_recursive, or as greedy_recursive_early_stop if min_node_size and
+        min_error_reduction are given, without slicing the data. The features and the target are converted to numpy
+        arrays once, and the data points of each node are a range of an array of row indices. When a node is split,
+        its range is partitioned in place into the left rows followed by the right rows, which are the ranges of the
+        children. The nodes that are left to build are kept on a stack instead of the call stack, so the depth of the
+        tree isn't limited by the recursion limit, see build_subtree.
+
+        With more than one worker, a thread pool is used, since numpy releases the GIL:
+            1. Nodes with at least parallel_node_size data points evaluate blocks of the features in parallel.
+            2. Nodes with less data points build their whole subtree as one task of the pool.
+        Each node is built the same way regardless of the thread that builds it, so the tree is the same regardless
+        of the amount of workers.
+
+        The label counts of every feature are only counted for the smaller child of a split, and the label counts of
+        the larger child are the label counts of the node minus the label counts of the smaller child, which roughly
+        halves the data that is read per level of the tree.
+
+        Args:
+            data (pandas.DataFrame): One hot encoded features with target.
+            features (list of str): List of features that we will decide to split on.
+            target (str): The feature that we want to predict.
+            model_parameters (dict): A dictionary of model parameters,
+                {
+                    current_depth (int): The depth of the root,
+                    max_depth (int): The maximum depth that the tree will be created,
+                    min_node_size (int): The minimum amount of samples per node, optional,
+                    min_error_reduction (float): Minimum error reduction per split, optional,
+                    workers (int): The amount of threads, optional, 1 by default,
+                    parallel_node_size (int): The minimum amount of samples of a node to evaluate its features in
+                        parallel instead of building its subtree as one task, optional, 10000 by default.
+                }
+
+        Returns:
+            A decision tree root, with the same dict format as greedy_recursive.
+
+        """
+        # Convert the features and the target to numpy arrays once, where the rows of every node are a range of
+        # row_indices, and the root has all of the rows
+        tree_data = {"features": features,
+                     "feature_matrix": data[features].values.astype(np.float64),
+                     "labels": data[target].values,
+                     "row_indices": np.arange(len(data))}
+
+        # The root is built with all of the rows and features
+        root = {}
+        root_task = (root, 0, len(data), list(range(len(features))), model_parameters["current_depth"], None)
+
+        # Build the tree in the current thread, or with a thread pool
+        workers = model_parameters.get("workers", 1)
+        if workers <= 1:
+            self.build_subtree(tree_data, root_task, model_parameters)
+        else:
+            with ThreadPoolExecutor(workers) as pool:
+                self.build_subtree(tree_data, root_task, model_parameters, pool)
+
+        return root
+
+    def build_subtree(self, tree_data, task, model_parameters, pool=None):
+        """Build a subtree of greedy_iterative.
+
+        Builds the node of the task and all of the nodes below it with a stack of tasks. If a thread pool is given,
+        the features of large nodes are evaluated in parallel, and the subtrees of small nodes are submitted to the
+        pool, where each subtree only partitions its own range of row indices.
+
+        Args:
+            tree_data (dict): The data of the tree,
+                {
+                    features (list of str): List of features that we will decide to split on,
+                    feature_matrix (numpy.ndarray): The features, one row per data point,
+                    labels (numpy.ndarray): Array of labels (1 or -1),
+                    row_indices (numpy.ndarray): The row indices, where the rows of a node are a range.
+                }
+            task (tuple): The node to build, (node dict, start, end, remaining features, depth, label counts), where
+                the node dict is filled in place, the remaining features are column indices of feature_matrix, and
+                the label counts of the node are None if they are not known, see label_counts.
+            model_parameters (dict): The model parameters of greedy_iterative.
+            pool (concurrent.futures.ThreadPoolExecutor): A thread pool, or None to build in the current thread.
+
+        """
+        feature_matrix = tree_data["feature_matrix"]
+        labels = tree_data["labels"]
+        row_indices = tree_data["row_indices"]
+        parallel_node_size = model_parameters.get("parallel_node_size", 10000)
+
+        # Use the early stopping conditions if they are given
+        early_stop = "min_node_size" in model_parameters and "min_error_reduction" in model_parameters
+
+        # The stack of nodes to build, and the subtrees that are submitted to the pool
+        stack = [task]
+        subtrees = []
+
+        while stack:
+            node, start, end, remaining_features, current_depth, right_counts = stack.pop()
+
+            # Build the subtree of a small node as one task of the pool
+            if pool is not None and end - start < parallel_node_size:
+                subtrees.append(pool.submit(self.build_subtree, tree_data,
+                                            (node, start, end, remaining_features, current_depth, right_counts),
+                                            model_parameters))
+                continue
+
+            node_rows = row_indices[start:end]
+            node_labels = labels[node_rows]
+
+            # Count the number of 1's and -1's, where the majority class makes mistakes on the minority class
+            num_ones = np.count_nonzero(node_labels == 1)
+            num_minus_ones = np.count_nonzero(node_labels == -1)
+            node_mistakes = min(num_ones, num_minus_ones)
+
+            # 1. No Mistakes after selecting majority class
+            # 2. No remaining features to split
+            # 3. Max depth is encountered
+            # Early stop: Stop if the node has less than minimum node size
+            if node_mistakes == 0 or not remaining_features or current_depth >= model_parameters["max_depth"] or \
+                    (early_stop and self.reached_minimum_node_size(node_rows, model_parameters["min_node_size"])):
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Count the labels of every feature if they are not known from the parent, where the features are
+            # counted in blocks by the pool for large nodes
+            if right_counts is None:
+                right_counts = self.node_label_counts(feature_matrix, node_rows, labels, pool,
+                                                      model_parameters.get("workers", 1))
+
+            # Find the best splitting feature among the remaining features
+            split_mistakes = self.split_mistakes_from_counts(right_counts[:, remaining_features], num_ones,
+                                                             num_minus_ones)
+            best_index = int(np.argmin(split_mistakes))
+            splitting_feature = remaining_features[best_index]
+
+            # Early stop: Stop if the error does not reduce
+            if early_stop and self.error_reduction(float(node_mistakes) / float(len(node_rows)),
+                                                   float(split_mistakes[best_index]) / float(len(node_rows))) <= \
+                    model_parameters["min_error_reduction"]:
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Split on the best feature that we found
+            right_mask = feature_matrix[node_rows, splitting_feature] == 1
+            num_right = np.count_nonzero(right_mask)
+
+            # 4. If the left split is equal to the amount of data
+            # 5. If the right split is equal to the amount of data
+            if num_right == 0 or num_right == len(node_rows):
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Partition the rows of the node in place, the left rows followed by the right rows
+            row_indices[start:end] = np.concatenate((node_rows[~right_mask], node_rows[right_mask]))
+            middle = end - num_right
+
+            # Count the labels of the smaller child, and subtract them from the node for the larger child, unless the
+            # children are at the maximum depth, where they don't split
+            left_counts, right_child_counts = None, None
+            if current_depth + 1 < model_parameters["max_depth"]:
+                left_counts, right_child_counts = self.subtract_counts(
+                    right_counts, num_right < middle - start, lambda rows: self.node_label_counts(
+                        feature_matrix, rows, labels, pool, model_parameters.get("workers", 1)),
+                    row_indices[start:middle], row_indices[middle:end])
+
+            # Create the node, and build the left tree and the right tree without the splitting feature
+            left_tree = {}
+            right_tree = {}
+            node.update(self.create_node(splitting_feature=tree_data["features"][splitting_feature], left=left_tree,
+                                         right=right_tree, is_leaf=False, prediction=None))
+            remaining_features = remaining_features[:best_index] + remaining_features[best_index + 1:]
+            stack.append((right_tree, middle, end, remaining_features, current_depth + 1, right_child_counts))
+            stack.append((left_tree, start, middle, remaining_features, current_depth + 1, left_counts))
+
+        # Wait for the subtrees, which raises the exception of a subtree if it failed
+        for subtree in subtrees:
+            subtree.result()
+
+    def node_label_counts(self, feature_matrix, node_rows, labels, pool=None, workers=1, block_size=4096):
+        """Count the labels of every feature of a node, see label_counts, with a thread pool.
+
+        A node that has every row is counted on feature_matrix directly, since the counts don't depend on the order of
+        the rows. The rows of other nodes are gathered in blocks of block_size rows, and the counts of the blocks are
+        added up, so only one block of rows is copied at a time.
+
+        If a thread pool is given, the features are split into one block per thread, where each thread only gathers
+        the rows of the node for its own block of features. The counts are concatenated in the order of the features,
+        so they are the same as counting every feature at once.
+
+        Args:
+            feature_matrix (numpy.ndarray): One hot encoded features (0 or 1), one row per data point.
+            node_rows (numpy.ndarray): The rows of the node.
+            labels (numpy.ndarray): Array of labels (1 or -1) of every row of feature_matrix.
+            pool (concurrent.futures.ThreadPoolExecutor): A thread pool, or None to count in the current thread.
+            workers (int): The amount of threads of the pool.
+            block_size (int): The maximum amount of rows that are gathered at once.
+
+        Returns:
+            numpy.ndarray: The label counts of every feature, see label_counts.
+
+        """
+        def block_label_counts(columns):
+            """Count the labels of the node for a slice of the features, gathering the rows in blocks."""
+            # Count every row without gathering them if the node has every row
+            if len(node_rows) == len(feature_matrix):
+                return self.label_counts(feature_matrix[:, columns], labels)
+
+            # Add up the counts of each block of rows
+            counts = np.zeros((2, feature_matrix[0:0, columns].shape[1]))
+            for start in range(0, len(node_rows), block_size):
+                block_rows = node_rows[start:start + block_size]
+                counts += self.label_counts(feature_matrix[block_rows, columns], labels[block_rows])
+
+            return counts
+
+        # Count every feature at once in the current thread
+        if pool is None:
+            return block_label_counts(slice(None))
+
+        # Split the features into one block per thread
+        blocks = [slice(block[0], block[-1] + 1)
+                  for block in np.array_split(np.arange(feature_matrix.shape[1]), workers) if len(block)]
+
+        # Count each block in the pool, and concatenate them in order
+        return np.concatenate([future.result() for future in [pool.submit(block_label_counts, block)
+                                                              for block in blocks]], axis=1)
+
+    @staticmethod
+    def subtract_counts(node_counts, left_is_smaller, count_rows, left_rows, right_rows):
+        """Compute the statistics of both children of a split with histogram subtraction.
+
+        The statistics of the children, such as label counts or histograms, add up to the statistics of the node, so
+        only the statistics of the smaller child are computed from its rows, and the statistics of the larger child
+        are the statistics of the node minus the statistics of the smaller child.
+
+        Args:
+            node_counts (numpy.ndarray): The statistics of the node.
+            left_is_smaller (bool): True if the left child has less rows than the right child.
+            count_rows (func): Function that computes the statistics of an array of rows.
+            left_rows (numpy.ndarray): The rows of the left child.
+            right_rows (numpy.ndarray): The rows of the right child.
+
+        Returns:
+            A tuple of the statistics of the children:
+                (
+                    numpy.ndarray: The statistics of the left child.
+                    numpy.ndarray: The statistics of the right child.
+                )
+
+        """
+        # Compute the statistics of the left child, and subtract them from the node for the right child
+        if left_is_smaller:
+            left_counts = count_rows(left_rows)
+            return left_counts, node_counts - left_counts
+
+        # Compute the statistics of the right child, and subtract them from the node for the left child
+        right_counts = count_rows(right_rows)
+        return node_counts - right_counts, right_counts
+
+    def greedy_bitset(self, data, features, target, model_parameters):
+        """Greedy iterative approach to build a binary decision tree on bitset features.
+
+        Builds the same tree as greedy_iterative, where the one hot encoded features are packed into bitsets of one
+        bit per data point, see BitsetFeatures, and the data points of each node are also a bitset. The label counts of
+        the right split of every feature are the popcounts of the AND of the feature, the node and the label bitsets,
+        and the children of a node are the AND of the node with the splitting feature and its complement. The cost of
+        a node is proportional to the amount of features times the amount of data points / 64, regardless of the size
+        of the node, which suits shallow trees on many one hot encoded features.
+
+        Args:
+            data (pandas.DataFrame): One hot encoded features with target.
+            features (list of str): List of features that we will decide to split on.
+            target (str): The feature that we want to predict.
+            model_parameters (dict): A dictionary of model parameters,
+                {
+                    current_depth (int): The depth of the root,
+                    max_depth (int): The maximum depth that the tree will be created,
+                    min_node_size (int): The minimum amount of samples per node, optional,
+                    min_error_reduction (float): Minimum error reduction per split, optional.
+                }
+
+        Returns:
+            A decision tree root, with the same dict format as greedy_recursive.
+
+        """
+        # Pack the features into bitsets, and the data points of each label
+        bitset_features = BitsetFeatures().pack(data[features].values)
+        labels = data[target].values
+        ones = bitset_features.pack_rows(labels == 1)
+        minus_ones = bitset_features.pack_rows(labels == -1)
+
+        # Use the early stopping conditions if they are given
+        early_stop = "min_node_size" in model_parameters and "min_error_reduction" in model_parameters
+
+        # The stack of nodes to build, where each node is (node dict, bitset of the data points, remaining features,
+        # depth), and the remaining features are indices of features
+        root = {}
+        stack = [(root, bitset_features.pack_rows(np.ones(len(data), dtype=bool)), list(range(len(features))),
+                  model_parameters["current_depth"])]
+
+        while stack:
+            node, node_bitset, remaining_features, current_depth = stack.pop()
+
+            # Count the number of 1's and -1's, where the majority class makes mistakes on the minority class
+            node_ones = node_bitset & ones
+            node_minus_ones = node_bitset & minus_ones
+            num_ones = int(bitset_features.popcount(node_ones))
+            num_minus_ones = int(bitset_features.popcount(node_minus_ones))
+            num_data = int(bitset_features.popcount(node_bitset))
+            node_mistakes = min(num_ones, num_minus_ones)
+
+            # 1. No Mistakes after selecting majority class
+            # 2. No remaining features to split
+            # 3. Max depth is encountered
+            # Early stop: Stop if the node has less than minimum node size
+            if node_mistakes == 0 or not remaining_features or current_depth >= model_parameters["max_depth"] or \
+                    (early_stop and num_data <= model_parameters["min_node_size"]):
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Count the 1's and -1's in the right split of every remaining feature, and the left split is the rest of
+            # the node, where the majority class of each split makes mistakes on the minority class
+            right_ones = bitset_features.feature_counts(node_ones, remaining_features)
+            right_minus_ones = bitset_features.feature_counts(node_minus_ones, remaining_features)
+            split_mistakes = np.minimum(num_ones - right_ones, num_minus_ones - right_minus_ones) + \
+                np.minimum(right_ones, right_minus_ones)
+
+            # Find the best splitting feature, the first feature with the least mistakes
+            best_index = int(np.argmin(split_mistakes))
+            splitting_feature = remaining_features[best_index]
+
+            # Early stop: Stop if the error does not reduce
+            if early_stop and self.error_reduction(float(node_mistakes) / float(num_data),
+                                                   float(split_mistakes[best_index]) / float(num_data)) <= \
+                    model_parameters["min_error_reduction"]:
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Split on the best feature that we found
+            right_bitset = node_bitset & bitset_features.bitsets[splitting_feature]
+            num_right = int(bitset_features.popcount(right_bitset))
+
+            # 4. If the left split is equal to the amount of data
+            # 5. If the right split is equal to the amount of data
+            if num_right == 0 or num_right == num_data:
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Create the node, and build the left tree and the right tree without the splitting feature
+            left_tree = {}
+            right_tree = {}
+            node.update(self.create_node(splitting_feature=features[splitting_feature], left=left_tree,
+                                         right=right_tree, is_leaf=False, prediction=None))
+            remaining_features = remaining_features[:best_index] + remaining_features[best_index + 1:]
+            stack.append((right_tree, right_bitset, remaining_features, current_depth + 1))
+            stack.append((left_tree, node_bitset & ~bitset_features.bitsets[splitting_feature], remaining_features,
+                          current_depth + 1))
+
+        return root
+
+    def greedy_threshold(self, data, features, target, model_parameters):
+        """Greedy iterative approach to build a binary decision tree on real valued features.
+
+        Builds a tree with the same greedy approach and stopping conditions as greedy_iterative, where a node splits
+        on a feature and a threshold, the left split has the data points where the feature value is less than or
+        equal to the threshold, and the right split has the rest. The features are quantized once into at most
+        max_bins bins per feature, see quantize_features, where the thresholds are the upper edges of the bins. For
+        each node, a histogram of the 1's and -1's in each bin of each feature is counted, and the cumulative sums of
+        the histograms are the counts of the left split of every threshold, see threshold_split_mistakes.
+
+        A feature that has two or less distinct values, such as a one hot encoded feature, can only be split once on
+        each path, the same as greedy_iterative, so one hot encoded features build the same tree as greedy_iterative.
+        A feature with more values can be split again with another threshold.
+
+        The histograms are only counted for the smaller child of a split, and the histograms of the larger child are
+        the histograms of the node minus the histograms of the smaller child, see subtract_counts.
+
+        Args:
+            data (pandas.DataFrame): Real valued features with target.
+            features (list of str): List of features that we will decide to split on.
+            target (str): The feature that we want to predict.
+            model_parameters (dict): A dictionary of model parameters,
+                {
+                    current_depth (int): The depth of the root,
+                    max_depth (int): The maximum depth that the tree will be created,
+                    min_node_size (int): The minimum amount of samples per node, optional,
+                    min_error_reduction (float): Minimum error reduction per split, optional,
+                    max_bins (int): The maximum amount of thresholds per feature, optional, 256 by default.
+                }
+
+        Returns:
+            A decision tree root, with the same dict format as greedy_recursive, where an intermediate stump also has
+            'threshold' (float): The threshold of the splitting feature.
+
+        """
+        # Quantize the features once, and convert the target to a numpy array
+        binned_features, thresholds = self.quantize_features(data[features].values.astype(np.float64),
+                                                             model_parameters.get("max_bins", 256))
+        labels = data[target].values
+        num_thresholds = np.array([len(feature_thresholds) for feature_thresholds in thresholds], dtype=np.int64)
+        num_bins = int(num_thresholds.max()) if len(features) else 0
+
+        # The rows of every node are a range of row_indices, where the root has all of the rows
+        row_indices = np.arange(len(data))
+
+        # Use the early stopping conditions if they are given
+        early_stop = "min_node_size" in model_parameters and "min_error_reduction" in model_parameters
+
+        # The stack of nodes to build, where each node is (node dict, start, end, remaining features, depth,
+        # histograms), the remaining features are column indices of binned_features in the order of features, and the
+        # histograms of the node are None if they are not known, see label_histograms
+        root = {}
+        stack = [(root, 0, len(data), list(range(len(features))), model_parameters["current_depth"], None)]
+
+        while stack:
+            node, start, end, remaining_features, current_depth, histograms = stack.pop()
+            node_rows = row_indices[start:end]
+            node_labels = labels[node_rows]
+
+            # Count the number of 1's and -1's, where the majority class makes mistakes on the minority class
+            num_ones = np.count_nonzero(node_labels == 1)
+            num_minus_ones = np.count_nonzero(node_labels == -1)
+            node_mistakes = min(num_ones, num_minus_ones)
+
+            # 1. No Mistakes after selecting majority class
+            # 2. No remaining features to split
+            # 3. Max depth is encountered
+            # Early stop: Stop if the node has less than minimum node size
+            if node_mistakes == 0 or not remaining_features or current_depth >= model_parameters["max_depth"] or \
+                    (early_stop and self.reached_minimum_node_size(node_rows, model_parameters["min_node_size"])):
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Count the histograms of every feature if they are not known from the parent
+            if histograms is None:
+                histograms = self.label_histograms(binned_features[node_rows], node_labels, num_bins)
+
+            # Compute the mistakes of every threshold of the remaining features, and find the first feature and
+            # threshold with the least mistakes
+            split_mistakes = self.threshold_split_mistakes(histograms[:, remaining_features],
+                                                           num_thresholds[remaining_features])
+            best_index, best_bin = np.unravel_index(int(np.argmin(split_mistakes)), split_mistakes.shape)
+            splitting_feature = remaining_features[best_index]
+
+            # Early stop: Stop if the error does not reduce
+            if early_stop and self.error_reduction(float(node_mistakes) / float(len(node_rows)),
+                                                   float(split_mistakes[best_index, best_bin]) /
+                                                   float(len(node_rows))) <= model_parameters["min_error_reduction"]:
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Split on the best feature and threshold that we found, where the right split is above the threshold
+            right_mask = binned_features[node_rows, splitting_feature] > best_bin
+            num_right = np.count_nonzero(right_mask)
+
+            # 4. If the left split is equal to the amount of data
+            # 5. If the right split is equal to the amount of data
+            if num_right == 0 or num_right == len(node_rows):
+                node.update(self.create_leaf_from_counts(num_ones, num_minus_ones))
+                continue
+
+            # Partition the rows of the node in place, the left rows followed by the right rows
+            row_indices[start:end] = np.concatenate((node_rows[~right_mask], node_rows[right_mask]))
+            middle = end - num_right
+
+            # Count the histograms of the smaller child, and subtract them from the node for the larger child, unless
+            # the children are at the maximum depth, where they don't split
+            left_histograms, right_histograms = None, None
+            if current_depth + 1 < model_parameters["max_depth"]:
+                left_histograms, right_histograms = self.subtract_counts(
+                    histograms, num_right < middle - start,
+                    lambda rows: self.label_histograms(binned_features[rows], labels[rows], num_bins),
+                    row_indices[start:middle], row_indices[middle:end])
+
+            # Create the node, and build the left tree and the right tree, where a feature with two or less values
+            # can't split the children again
+            left_tree = {}
+            right_tree = {}
+            node.update(self.create_threshold_node(splitting_feature=features[splitting_feature],
+                                                   threshold=float(thresholds[splitting_feature][best_bin]),
+                                                   left=left_tree, right=right_tree))
+            if num_thresholds[splitting_feature] <= 2:
+                remaining_features = remaining_features[:best_index] + remaining_features[best_index + 1:]
+            stack.append((right_tree, middle, end, remaining_features, current_depth + 1, right_histograms))
+            stack.append((left_tree, start, middle, remaining_features, current_depth + 1, left_histograms))
+
+        return root
+
+    @staticmethod
+    def quantize_features(feature_matrix, max_bins=256):
+        """Quantize real valued features into bins.
+
+        The thresholds of a feature are its distinct values if it has at most max_bins distinct values, otherwise
+        max_bins quantiles of its values, which always include the maximum value. The bin of a value is the index of
+        the first threshold that is greater than or equal to the value, so a value is less than or equal to
+        threshold b if and only if its bin is less than or equal to b.
+
+        Args:
+            feature_matrix (numpy.ndarray): Real valued features, one row per data point, and one column per feature.
+            max_bins (int): The maximum amount of thresholds per feature.
+
+        Returns:
+            A tuple of the bins and the thresholds:
+                (
+                    binned_features (numpy.ndarray): The bin of each value, with the same shape as feature_matrix.
+                    thresholds (list of numpy.ndarray): The sorted thresholds of each feature.
+                )
+
+        """
+        # Use the smallest integer type that can store the bins, 0 to max_bins - 1
+        binned_features = np.zeros(feature_matrix.shape, dtype=np.min_scalar_type(max_bins - 1))
+        thresholds = []
+
+        for feature in range(feature_matrix.shape[1]):
+            # Use the distinct values, or quantiles of the values that are values of the feature
+            feature_thresholds = np.unique(feature_matrix[:, feature])
+            if len(feature_thresholds) > max_bins:
+                feature_thresholds = np.unique(np.quantile(feature_matrix[:, feature],
+                                                           np.linspace(0., 1., max_bins + 1)[1:], method="lower"))
+
+            # Find the bin of each value
+            binned_features[:, feature] = np.searchsorted(feature_thresholds, feature_matrix[:, feature], side="left")
+            thresholds.append(feature_thresholds)
+
+        return binned_features, thresholds
+
+    @staticmethod
+    def threshold_histograms(binned_features, num_bins):
+        """Count the data points in each bin of each feature.
+
+        Args:
+            binned_features (numpy.ndarray): The bin of each value, one row per data point, and one column per feature.
+            num_bins (int): The amount of bins of each feature.
+
+        Returns:
+            numpy.ndarray: The amount of data points in each bin, one row per feature, and one column per bin.
+
+        """
+        # Offset the bins of each feature, so the bins of every feature are counted with one bincount
+        offsets = np.arange(binned_features.shape[1], dtype=np.int64) * num_bins
+        return np.bincount((binned_features + offsets).ravel(), minlength=binned_features.shape[1] * num_bins).reshape(
+            binned_features.shape[1], num_bins)
+
+    def label_histograms(self, binned_features, labels, num_bins):
+        """Count the 1's and -1's in each bin of each feature.
+
+        Args:
+            binned_features (numpy.ndarray): The bin of each value, one row per data point, and one column per feature.
+            labels (numpy.ndarray): Array of labels (1 or -1).
+            num_bins (int): The amount of bins of each feature.
+
+        Returns:
+            numpy.ndarray: The histograms of the labels, where index 0 is the histogram of the 1's, index 1 is the
+                histogram of the -1's, and each histogram has one row per feature, and one column per bin.
+
+        """
+        return np.array([self.threshold_histograms(binned_features[labels == 1], num_bins),
+                         self.threshold_histograms(binned_features[labels == -1], num_bins)])
+
+    @staticmethod
+    def threshold_split_mistakes(histograms, num_thresholds):
+        """Compute the number of mistakes of splitting on each threshold of each feature.
+
+        The cumulative sums of the histograms of the labels over the bins, see label_histograms, are the counts of the
+        left split (feature value is less than or equal to the threshold) of each threshold, and the right split is
+        the rest. The mistakes of a split are the mistakes of the majority class of each side, see
+        intermediate_node_mistakes.
+
+        Args:
+            histograms (numpy.ndarray): The histograms of the labels, see label_histograms.
+            num_thresholds (numpy.ndarray): The amount of thresholds of each feature.
+
+        Returns:
+            numpy.ndarray: The number of mistakes after splitting on each threshold, one row per feature, and one
+                column per threshold, where the thresholds that a feature doesn't have are the largest int64.
+
+        """
+        # Count the 1's and -1's of the left split of every threshold
+        left_ones = np.cumsum(histograms[0], axis=1)
+        left_minus_ones = np.cumsum(histograms[1], axis=1)
+
+        # The majority class of each split makes mistakes on the minority class, where the right split is the rest
+        split_mistakes = np.minimum(left_ones, left_minus_ones) + np.minimum(left_ones[:, -1:] - left_ones,
+                                                                             left_minus_ones[:, -1:] - left_minus_ones)
+
+        # Features with less thresholds can't split on the remaining bins
+        split_mistakes[np.arange(histograms.shape[2]) >= num_thresholds[:, np.newaxis]] = np.iinfo(np.int64).max
+
+        return split_mistakes
+
     @staticmethod
     def intermediate_node_mistakes(data_labels):
         """Compute and returns number of errors of a majority class.
@@ -278,6 +870,9 @@ class BinaryDecisionTrees:
                               ----------------
                               # total examples
 
+        The mistakes of every feature are computed at once on a numpy matrix of the features, see split_mistakes,
+        instead of splitting the data for each feature.
+
         Args:
             data (pandas.DataFrame): Current node pandas frame that contains one hot encoded features.
             features (list of str): List of feature names.
@@ -287,42 +882,106 @@ class BinaryDecisionTrees:
             best_feature (str): The best feature to split on with the lowest classification error.
 
         """
-        # Keep track of best feature and lowest error, since error is always less than 1, we need to setup
-        # best_error that is greater than 1
-        best_feature = None
-        best_error = 2.0
+        # Corner case: If there are no features, there's no feature to split on
+        if not features:
+            return None
+
+        # Find the index of the feature with the lowest classification error
+        best_index, _ = self.best_feature_index(data[features].values.astype(np.float64), data[target].values)
+
+        return features[best_index]
+
+    def best_feature_index(self, feature_matrix, labels):
+        """Determine the index of the best feature to split.
+
+        Determine the feature with the lowest classification error, which is the feature with the least mistakes,
+        since every feature splits the same amount of data points. If features have the same amount of mistakes, then
+        the first feature is picked.
+
+        Args:
+            feature_matrix (numpy.ndarray): One hot encoded features (0 or 1) of the current node, one row per data
+                point, and one column per feature.
+            labels (numpy.ndarray): Array of labels (1 or -1) of the current node.
+
+        Returns:
+            A tuple of the best feature and its mistakes:
+                (
+                    int: The column of the best feature in feature_matrix.
+                    int: The number of mistakes after splitting on the best feature.
+                )
+
+        """
+        # Compute the number of mistakes of every feature, and pick the first feature with the least mistakes
+        mistakes = self.split_mistakes(feature_matrix, labels)
+        best_index = int(np.argmin(mistakes))
+
+        return best_index, int(mistakes[best_index])
+
+    def split_mistakes(self, feature_matrix, labels):
+        """Compute the number of mistakes of splitting on each feature.
+
+        Count the labels of the right split (feature value is 1) of every feature with one matrix product, see
+        label_counts. The counts of the left split (feature value is 0) are the counts of the node minus the counts of
+        the right split. The mistakes of a split are the mistakes of the majority class of each side, see
+        intermediate_node_mistakes.
+
+        Args:
+            feature_matrix (numpy.ndarray): One hot encoded features (0 or 1), one row per data point, and one column
+                per feature.
+            labels (numpy.ndarray): Array of labels (1 or -1).
+
+        Returns:
+            numpy.ndarray: The number of mistakes after splitting on each feature.
+
+        """
+        return self.split_mistakes_from_counts(self.label_counts(feature_matrix, labels),
+                                               np.count_nonzero(labels == 1), np.count_nonzero(labels == -1))
+
+    @staticmethod
+    def label_counts(feature_matrix, labels):
+        """Count the labels of the right split of every feature.
 
-        # Convert to float to make sure error gets computed correctly.
-        num_data = float(len(data))
+        Count the 1's and -1's of the data points where the feature value is 1 with one matrix product,
+        classes^T * feature_matrix, where classes has a column of indicators for each label.
 
-        # Loop through each feature to consider splitting on that feature
-        for feature in features:
+        Args:
+            feature_matrix (numpy.ndarray): One hot encoded features (0 or 1), one row per data point, and one column
+                per feature.
+            labels (numpy.ndarray): Array of labels (1 or -1).
 
-            # The left split will have all data points where the feature value is 0
-            left_split = data[data[feature] == 0]
+        Returns:
+            numpy.ndarray: The label counts of every feature, where row 0 is the amount of 1's, row 1 is the amount
+                of -1's, and there's one column per feature.
+
+        """
+        # Create an indicator column for each label, 1 and -1
+        classes = np.empty((len(labels), 2))
+        classes[:, 0] = labels == 1
+        classes[:, 1] = labels == -1
 
-            # The right split will have all data points where the feature value is 1
-            right_split = data[data[feature] == 1]
+        # Count the 1's and -1's in the right split of every feature
+        return classes.T.dot(feature_matrix)
 
-            # Calculate the number of misclassified examples in the left split
-            left_mistakes = self.intermediate_node_mistakes(left_split[target])
+    @staticmethod
+    def split_mistakes_from_counts(right_counts, num_ones, num_minus_ones):
+        """Compute the number of mistakes of splitting on each feature from the label counts of the right splits.
 
-            # Calculate the number of misclassified examples in the right split
-            right_mistakes = self.intermediate_node_mistakes(right_split[target])
+        Args:
+            right_counts (numpy.ndarray): The label counts of the right split of each feature, see label_counts.
+            num_ones (int): The amount of 1's of the node.
+            num_minus_ones (int): The amount of -1's of the node.
 
-            # Compute the classification error of this split.
-            # error = # of left mistakes + # of right mistakes
-            #         ----------------------------------------
-            #                     total examples
-            error = float(left_mistakes + right_mistakes) / num_data
+        Returns:
+            numpy.ndarray: The number of mistakes after splitting on each feature.
 
-            # If this is the best error we have found so far,
-            # then store the feature as best_feature and the error as best_error
-            if error < best_error:
-                best_error = error
-                best_feature = feature
+        """
+        # The left split is the rest of the node
+        left_ones = num_ones - right_counts[0]
+        left_minus_ones = num_minus_ones - right_counts[1]
 
-        return best_feature
+        # The majority class of each split makes mistakes on the minority class
+        return (np.minimum(left_ones, left_minus_ones) + np.minimum(right_counts[0], right_counts[1])).astype(
+            np.int64)
 
     def create_leaf(self, data_labels):
         """Create a leaf node for decision tree algorithm.
@@ -348,6 +1007,19 @@ class BinaryDecisionTrees:
         num_ones = len(data_labels[data_labels == +1])
         num_minus_ones = len(data_labels[data_labels == -1])
 
+        return self.create_leaf_from_counts(num_ones, num_minus_ones)
+
+    def create_leaf_from_counts(self, num_ones, num_minus_ones):
+        """Create a leaf node from the number of data points of each label.
+
+        Args:
+            num_ones (int): The number of data points that are +1.
+            num_minus_ones (int): The number of data points that are -1.
+
+        Returns:
+            leaf node (dict): A leaf node, see create_leaf.
+
+        """
         # For the leaf node, set the prediction to be the majority class
         if num_ones > num_minus_ones:
             prediction = 1
@@ -390,6 +1062,27 @@ class BinaryDecisionTrees:
                 'is_leaf': is_leaf,
                 'prediction': prediction}
 
+    def create_threshold_node(self, splitting_feature, threshold, left, right):
+        """Create an intermediate node that splits on a threshold of a real valued feature.
+
+        Args:
+            splitting_feature (str): The feature that is split in this node.
+            threshold (float): The left node has the data points where the feature value is less than or equal to the
+                threshold, and the right node has the rest.
+            left (dict): The left node.
+            right (dict): The right node.
+
+        Returns:
+            node (dict): An intermediate node with the dict format of create_node, and
+                'threshold' (float): The threshold of the splitting feature.
+
+        """
+        node = self.create_node(splitting_feature=splitting_feature, left=left, right=right, is_leaf=False,
+                                prediction=None)
+        node['threshold'] = threshold
+
+        return node
+
     @staticmethod
     def reached_minimum_node_size(data, min_node_size):
         """Decide if we reached minimum node size.
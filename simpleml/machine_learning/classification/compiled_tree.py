@@ -0,0 +1,218 @@
+"""Implements CompiledTree."""
+
+import numpy as np
+
+
+class CompiledTree:
+
+    """A decision tree flattened into parallel numpy arrays.
+
+    Compiles a decision tree in the dict format of BinaryDecisionTrees and WeightedBinaryDecisionTrees into arrays,
+    where node i is described by index i of each array, and the root is node 0. The nodes are numbered in pre-order,
+    so the left child of a node directly follows the node.
+
+    Attributes:
+        features (list of str): The features that the tree can split on, the splitting feature of a node is an
+            index of this list.
+        splitting_feature (numpy.ndarray): The index of the splitting feature of each node, -1 for leaves.
+        left (numpy.ndarray): The index of the left child (feature value is 0) of each node, -1 for leaves.
+        right (numpy.ndarray): The index of the right child (feature value is 1) of each node, -1 for leaves.
+        threshold (numpy.ndarray): The threshold of each node that splits on a real valued feature, where the left
+            child has the values that are less than or equal to the threshold, NaN for other nodes.
+        prediction (numpy.ndarray): The prediction of each leaf, 0 for intermediate nodes.
+
+    """
+
+    def __init__(self):
+        """Set up CompiledTree.
+
+        Creates an empty tree, which is filled by compile or load.
+
+        """
+        self.features = []
+        self.splitting_feature = np.zeros(0, dtype=np.int32)
+        self.left = np.zeros(0, dtype=np.int32)
+        self.right = np.zeros(0, dtype=np.int32)
+        self.threshold = np.zeros(0)
+        self.prediction = np.zeros(0, dtype=np.int64)
+
+    def compile(self, tree, features=None):
+        """Compile a decision tree dict into arrays.
+
+        Args:
+            tree (dict): The top node of a binary tree, with the following dict format:
+                {
+                    'is_leaf' (bool): False,
+                    'prediction' (NoneType): None,
+                    'splitting_feature' (str): splitting_feature,
+                    'left' (dict): left_tree,
+                    'right' (dict): right_tree
+                }
+                where a node that splits on a real valued feature also has 'threshold' (float).
+            features (list of str): The features that the tree was trained on, so that the splitting features are
+                columns of the same feature matrix. If None, the features are the splitting features of the tree, in
+                the order that they are first seen.
+
+        Returns:
+            CompiledTree: self, with the compiled tree.
+
+        """
+        # Look up the index of each feature, and add splitting features that are missing if there are no features
+        self.features = list(features) if features is not None else []
+        feature_indices = {feature: index for index, feature in enumerate(self.features)}
+
+        # Store the arrays as lists while the tree is traversed
+        splitting_feature = []
+        left = []
+        right = []
+        threshold = []
+        prediction = []
+
+        # Traverse the tree in pre-order with a stack of (node, index of the parent, side of the parent), where the
+        # right child is pushed first, so that the left child is numbered first
+        stack = [(tree, -1, None)]
+        while stack:
+            node, parent, side = stack.pop()
+
+            # Number the node, and link the node to its parent
+            index = len(prediction)
+            if side is not None:
+                side[parent] = index
+
+            # Leaves only have a prediction
+            if node['is_leaf']:
+                splitting_feature.append(-1)
+                left.append(-1)
+                right.append(-1)
+                threshold.append(np.nan)
+                prediction.append(node['prediction'])
+                continue
+
+            # Intermediate nodes have a splitting feature, and children that are linked when they are numbered
+            if node['splitting_feature'] not in feature_indices:
+                if features is not None:
+                    raise ValueError("Unknown splitting feature: {}".format(node['splitting_feature']))
+                feature_indices[node['splitting_feature']] = len(self.features)
+                self.features.append(node['splitting_feature'])
+            splitting_feature.append(feature_indices[node['splitting_feature']])
+            left.append(-1)
+            right.append(-1)
+            threshold.append(node.get('threshold', np.nan))
+            prediction.append(0)
+            stack.append((node['right'], index, right))
+            stack.append((node['left'], index, left))
+
+        # Convert the lists to arrays
+        self.splitting_feature = np.array(splitting_feature, dtype=np.int32)
+        self.left = np.array(left, dtype=np.int32)
+        self.right = np.array(right, dtype=np.int32)
+        self.threshold = np.array(threshold, dtype=np.float64)
+        self.prediction = np.array(prediction)
+
+        return self
+
+    @staticmethod
+    def route(compiled_tree, feature_matrix, rows, nodes):
+        """Route data points from their start nodes to the leaves that they reach.
+
+        Routes every pair of a data point and a start node at once, one level at a time. At each level, the pairs that
+        have not reached a leaf move to the left child of their node if the value of the splitting feature is 0 (or
+        less than or equal to the threshold of the node if it has one), otherwise to the right child, and the pairs
+        that reach a leaf are removed. Hence the amount of numpy operations is proportional to the depth of the tree
+        rather than the amount of data points.
+
+        Args:
+            compiled_tree (CompiledTree): The arrays of the nodes, splitting_feature, left, right and threshold, of a
+                compiled tree or of any other flattened trees, such as CompiledEnsemble.
+            feature_matrix (numpy.ndarray): The features of the data points, one row per data point, and one column
+                per feature of the splitting features.
+            rows (numpy.ndarray): The row of feature_matrix of each pair.
+            nodes (numpy.ndarray): The start node of each pair, such as the root of a tree.
+
+        Returns:
+            numpy.ndarray: The leaf that each pair reaches.
+
+        """
+        # Every pair starts at its start node
+        leaves = np.array(nodes, dtype=np.int64)
+
+        # The pairs that have not reached a leaf, their data point and their current node
+        active_pairs = np.flatnonzero(compiled_tree.left[leaves] >= 0)
+        active_rows = np.asarray(rows)[active_pairs]
+        active_nodes = leaves[active_pairs]
+
+        while len(active_pairs):
+            # Move each pair to the left child if the value of the splitting feature is 0, or less than or equal to
+            # the threshold if the node has one, otherwise right
+            split_feature_values = feature_matrix[active_rows, compiled_tree.splitting_feature[active_nodes]]
+            thresholds = compiled_tree.threshold[active_nodes]
+            active_nodes = np.where(np.where(np.isnan(thresholds), split_feature_values == 0,
+                                             split_feature_values <= thresholds),
+                                    compiled_tree.left[active_nodes], compiled_tree.right[active_nodes])
+
+            # Store the leaves that are reached, and keep routing the rest of the pairs
+            reached_leaf = compiled_tree.left[active_nodes] < 0
+            leaves[active_pairs[reached_leaf]] = active_nodes[reached_leaf]
+            active_pairs = active_pairs[~reached_leaf]
+            active_rows = active_rows[~reached_leaf]
+            active_nodes = active_nodes[~reached_leaf]
+
+        return leaves
+
+    def to_dict(self):
+        """Convert the compiled tree back into a decision tree dict.
+
+        Returns:
+            dict: The top node of a binary tree, in the same dict format as compile.
+
+        """
+        # Create the dict of every node, and link the children of each node afterwards
+        nodes = [{'splitting_feature': self.features[feature] if feature >= 0 else None,
+                  'left': None,
+                  'right': None,
+                  'is_leaf': bool(feature < 0),
+                  'prediction': prediction if feature < 0 else None}
+                 for feature, prediction in zip(self.splitting_feature.tolist(), self.prediction.tolist())]
+
+        # Link the children of the intermediate nodes, and add the threshold of real valued splits
+        for node, left, right, threshold in zip(nodes, self.left.tolist(), self.right.tolist(),
+                                                self.threshold.tolist()):
+            if left >= 0:
+                node['left'] = nodes[left]
+                node['right'] = nodes[right]
+            if not np.isnan(threshold):
+                node['threshold'] = threshold
+
+        return nodes[0] if nodes else None
+
+    def save(self, path):
+        """Save the compiled tree to a compressed numpy file.
+
+        Args:
+            path (str): Path of the file, where numpy adds the .npz extension if it's missing.
+
+        """
+        np.savez_compressed(path, features=np.array(self.features, dtype=str), splitting_feature=self.splitting_feature,
+                            left=self.left, right=self.right, threshold=self.threshold, prediction=self.prediction)
+
+    def load(self, path):
+        """Load a compiled tree from a compressed numpy file that was created by save.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            CompiledTree: self, with the loaded tree.
+
+        """
+        with np.load(path) as arrays:
+            self.features = arrays["features"].tolist()
+            self.splitting_feature = arrays["splitting_feature"]
+            self.left = arrays["left"]
+            self.right = arrays["right"]
+            self.prediction = arrays["prediction"]
+
+            # Files without thresholds only have one hot encoded splits
+            self.threshold = arrays["threshold"] if "threshold" in arrays.files else np.full(len(self.left), np.nan)
+
+        return self
@@ -1,5 +1,7 @@
 """Implements WeightedBinaryDecisionTrees."""
 
+import numpy as np
+
 
 class WeightedBinaryDecisionTrees:
 
@@ -12,8 +14,14 @@ class WeightedBinaryDecisionTrees:
                 1. If nothing more to split, make prediction.
                 2. Otherwise, go to step 2 and continue.
 
+    Statics:
+        SPLIT_TOLERANCE (float): Weighted errors of splits that are within SPLIT_TOLERANCE times the total weighted
+            error of a node of the lowest weighted error are ties, see lowest_error_index.
+
     """
 
+    SPLIT_TOLERANCE = 1e-9
+
     def greedy_recursive(self, data, features, target, model_parameters):
         """Greedy recursive approach to build a weighted binary decision tree.
 
@@ -124,6 +132,126 @@ class WeightedBinaryDecisionTrees:
         return self.create_node(splitting_feature=splitting_feature, left=left_tree, right=right_tree, is_leaf=False,
                                 prediction=None)
 
+    def greedy_iterative(self, data, features, target, model_parameters):
+        """Greedy iterative approach to build a weighted binary decision tree.
+
+        Builds the same tree as greedy_recursive without slicing the data. The features, the target and the weights
+        are converted to numpy arrays once, and the data points of each node are a range of an array of row indices,
+        which index the rows of the features, the target and the weights. When a node is split, its range is
+        partitioned in place into the left rows followed by the right rows, which are the ranges of the children.
+        The nodes that are left to build are kept on a stack instead of the call stack.
+
+        The weighted label sums of every feature are only summed for the smaller child of a split, and the sums of the
+        larger child are the sums of the node minus the sums of the smaller child, which roughly halves the data that
+        is read per level of the tree. The subtracted sums can be rounded differently than summing the data points
+        directly, so splits whose weighted errors are within a tolerance of the lowest weighted error are ties, see
+        lowest_error_index, as in greedy_recursive.
+
+        Args:
+            data (pandas.DataFrame): One hot encoded features with target.
+            features (list of str): List of features that we will decide to split on.
+            target (str): The feature that we want to predict.
+            model_parameters (dict): A dictionary of model parameters,
+                {
+                    data_weights (pandas.Series or numpy.ndarray): Weights for corresponding label, in the order of
+                        the rows of data,
+                    current_depth (int): The depth of the root,
+                    max_depth (int): The maximum depth that the tree will be created,
+                    minimum_error (float): The minimum error to count as no error,
+                    histogram_subtraction (bool): If False, the sums of both children are summed directly, optional,
+                        True by default.
+                }
+
+        Returns:
+            A decision tree root, with the same dict format as greedy_recursive.
+
+        """
+        # Convert the features, the target and the weights to numpy arrays once
+        feature_matrix = data[features].values.astype(np.float64)
+        labels = data[target].values
+        data_weights = np.ascontiguousarray(model_parameters["data_weights"], dtype=np.float64)
+
+        # Subtract the sums of the smaller child from the node for the larger child, unless it's turned off
+        histogram_subtraction = model_parameters.get("histogram_subtraction", True)
+
+        # The rows of every node are a range of row_indices, where the root has all of the rows
+        row_indices = np.arange(len(data))
+
+        # The stack of nodes to build, where each node is (node dict, start, end, remaining features, depth, sums),
+        # the remaining features are column indices of feature_matrix in the order of features, and the weighted label
+        # sums of the node are None if they are not known, see weighted_label_sums
+        root = {}
+        stack = [(root, 0, len(data), list(range(len(features))), model_parameters["current_depth"], None)]
+
+        while stack:
+            node, start, end, remaining_features, current_depth, label_sums = stack.pop()
+            node_rows = row_indices[start:end]
+            node_labels = labels[node_rows]
+            node_weights = data_weights[node_rows]
+
+            # Compute the weighted mistakes of the majority class, and the majority class
+            weighted_mistakes, prediction = self.lowest_weighted_mistakes(np.sum(node_weights[node_labels == 1]),
+                                                                          np.sum(node_weights[node_labels != 1]))
+
+            # 1. No weighted error after selecting majority class
+            # 2. No remaining features to split
+            # 3. Max depth is encountered
+            if weighted_mistakes <= model_parameters["minimum_error"] or not remaining_features or \
+                    current_depth >= model_parameters["max_depth"]:
+                node.update(self.create_node(splitting_feature=None, left=None, right=None, is_leaf=True,
+                                             prediction=prediction))
+                continue
+
+            # Sum the weights of the remaining features if they are not known from the parent, where the sums of
+            # every feature are kept if they are subtracted for the children
+            if label_sums is None:
+                summed_features = list(range(len(features))) if histogram_subtraction else remaining_features
+                label_sums = self.weighted_label_sums(feature_matrix[node_rows][:, summed_features], node_labels,
+                                                      node_weights)
+            node_sums = label_sums[:, :, remaining_features] if histogram_subtraction else label_sums
+
+            # Find the best splitting feature among the remaining features, the first feature with the lowest
+            # weighted error
+            errors = self.weighted_split_mistakes_from_sums(node_sums) / float(len(node_rows))
+            best_index = self.lowest_error_index(errors, np.sum(np.abs(node_weights)) / float(len(node_rows)))
+            splitting_feature = remaining_features[best_index]
+
+            # Split on the best feature that we found
+            right_mask = feature_matrix[node_rows, splitting_feature] == 1
+            num_right = np.count_nonzero(right_mask)
+
+            # 4. If the left split is equal to the amount of data
+            # 5. If the right split is equal to the amount of data
+            if num_right == 0 or num_right == len(node_rows):
+                node.update(self.create_node(splitting_feature=None, left=None, right=None, is_leaf=True,
+                                             prediction=prediction))
+                continue
+
+            # Partition the rows of the node in place, the left rows followed by the right rows
+            row_indices[start:end] = np.concatenate((node_rows[~right_mask], node_rows[right_mask]))
+            middle = end - num_right
+
+            # Sum the weights of the smaller child, and subtract them from the node for the larger child, unless the
+            # subtraction is turned off, or the children are at the maximum depth, where they don't split
+            left_sums, right_sums = None, None
+            if histogram_subtraction and current_depth + 1 < model_parameters["max_depth"]:
+                smaller_rows = row_indices[start:middle] if middle - start < num_right else row_indices[middle:end]
+                smaller_sums = self.weighted_label_sums(feature_matrix[smaller_rows], labels[smaller_rows],
+                                                        data_weights[smaller_rows])
+                left_sums, right_sums = (smaller_sums, label_sums - smaller_sums) if middle - start < num_right \
+                    else (label_sums - smaller_sums, smaller_sums)
+
+            # Create the node, and build the left tree and the right tree without the splitting feature
+            left_tree = {}
+            right_tree = {}
+            node.update(self.create_node(splitting_feature=features[splitting_feature], left=left_tree,
+                                         right=right_tree, is_leaf=False, prediction=None))
+            remaining_features = remaining_features[:best_index] + remaining_features[best_index + 1:]
+            stack.append((right_tree, middle, end, remaining_features, current_depth + 1, right_sums))
+            stack.append((left_tree, start, middle, remaining_features, current_depth + 1, left_sums))
+
+        return root
+
     @staticmethod
     def intermediate_node_weighted_mistakes(data_labels, data_weights):
         """Compute and returns number of errors of lowest weighted error.
@@ -144,11 +272,30 @@ class WeightedBinaryDecisionTrees:
 
         """
         # Sum of the weight where the label data are == 1, which means the weight of mistakes if we chose -1
-        weighted_mistakes_negative = sum(data_weights[data_labels == 1])
+        weighted_mistakes_negative = np.sum(data_weights[data_labels == 1])
 
         # Sum of the weight where the label data are == -1, which means the weight of mistakes if we chose +1
-        weighted_mistakes_positive = sum(data_weights[data_labels != 1])
+        weighted_mistakes_positive = np.sum(data_weights[data_labels != 1])
+
+        return WeightedBinaryDecisionTrees.lowest_weighted_mistakes(weighted_mistakes_negative,
+                                                                    weighted_mistakes_positive)
 
+    @staticmethod
+    def lowest_weighted_mistakes(weighted_mistakes_negative, weighted_mistakes_positive):
+        """Choose the label with the lowest weighted mistakes.
+
+        Args:
+            weighted_mistakes_negative (float): The weight of mistakes if we chose -1.
+            weighted_mistakes_positive (float): The weight of mistakes if we chose +1.
+
+        Returns:
+            A tuple that contains weight, and label:
+                (
+                    float: Lowest weighted error.
+                    int: Corresponding label for lowest weighted error.
+                )
+
+        """
         # Return the tuple of (weight, label), where we return (weight, -1) if weighted_mistakes_negative was less
         # than +1 label, and vice versa.
         return (weighted_mistakes_negative, -1) if weighted_mistakes_negative < weighted_mistakes_positive \
@@ -162,54 +309,112 @@ class WeightedBinaryDecisionTrees:
                         ------------------
                          # total examples
 
+        The weighted mistakes of every feature are computed at once on a numpy matrix of the features, see
+        weighted_split_mistakes, instead of splitting the data and the weights for each feature. If features have the
+        same weighted error, within a tolerance, then the first feature is picked, see lowest_error_index.
+
         Args:
             data (pandas.DataFrame): Current node pandas frame that contains one hot encoded features.
             features (list of str): List of feature names.
             target (str): The target label that we are trying to predict.
-            data_weights (pandas.Series): Weights for corresponding error
+            data_weights (pandas.Series): Weights for corresponding error, in the order of the rows of data.
 
         Returns:
             best_feature (str): The best feature to split on with the lowest weighted error.
 
         """
-        # Keep track of best feature and lowest error, since error is always less than 1, we need to setup
-        # best_error that is greater than 1
-        best_feature = None
-        best_error = 2.0
-
-        # Convert to float to make sure error gets computed correctly.
-        num_data = float(len(data))
-
-        # Loop through each feature to consider splitting on that feature
-        for feature in features:
-
-            # The left split will have all data points where the feature value is 0
-            left_split = data[data[feature] == 0]
-
-            # The right split will have all data points where the feature value is 1
-            right_split = data[data[feature] == 1]
-
-            # Apply the same filtering to data_weights to create left_data_weights, right_data_weights
-            # Calculate the weight of mistakes for left and right sides
-            left_weighted_mistakes, _ = self.intermediate_node_weighted_mistakes(left_split[target],
-                                                                                 data_weights[data[feature] == 0])
-            right_weighted_mistakes, _ = self.intermediate_node_weighted_mistakes(right_split[target],
-                                                                                  data_weights[data[feature] == 1])
-
-            # Compute the weighted error of this split.
-            # error = # of left mistakes + # of right mistakes
-            #         ----------------------------------------
-            #                     total examples
-            error = float(left_weighted_mistakes + right_weighted_mistakes) / num_data
-
-            # If this is the best error we have found so far,
-            # then store the feature as best_feature and the error as best_error
-            if error < best_error:
-                best_error = error
-                best_feature = feature
-
-        # Return the best feature we found
-        return best_feature
+        # Corner case: If there are no features, there's no feature to split on
+        if not features:
+            return None
+
+        # Compute the weighted error of every feature
+        errors = self.weighted_split_mistakes(data[features].values.astype(np.float64), data[target].values,
+                                              np.asarray(data_weights, dtype=np.float64)) / float(len(data))
+
+        # Return the first feature with the lowest weighted error
+        return features[self.lowest_error_index(errors, np.sum(np.abs(np.asarray(data_weights, dtype=np.float64))) /
+                                                float(len(data)))]
+
+    @staticmethod
+    def lowest_error_index(errors, total_error):
+        """Find the first split with the lowest weighted error, where weighted errors within a tolerance are ties.
+
+        Sums of float weights are rounded differently depending on how they are summed, such as by subtracting the
+        sums of a child from the sums of a node, so weighted errors that are equal can differ in the last bits. Hence
+        the first weighted error that is within SPLIT_TOLERANCE*total_error of the lowest weighted error is picked.
+
+        Args:
+            errors (numpy.ndarray): The weighted error of each split.
+            total_error (float): The total weight of the node divided by the amount of data points, which is the
+                scale of the weighted errors.
+
+        Returns:
+            int: The index of the first split with the lowest weighted error.
+
+        """
+        return int(np.argmax(errors <= np.min(errors) + WeightedBinaryDecisionTrees.SPLIT_TOLERANCE * total_error))
+
+    def weighted_split_mistakes(self, feature_matrix, labels, data_weights):
+        """Compute the weighted mistakes of splitting on each feature.
+
+        Sum the weights of each label in the right split and the left split of every feature, see weighted_label_sums.
+        The weighted mistakes of a split are the weighted mistakes of the lowest weighted mistakes label of each side,
+        see intermediate_node_weighted_mistakes.
+
+        Args:
+            feature_matrix (numpy.ndarray): One hot encoded features (0 or 1), one row per data point, and one column
+                per feature.
+            labels (numpy.ndarray): Array of labels (1 or -1).
+            data_weights (numpy.ndarray): Weights of the data points.
+
+        Returns:
+            numpy.ndarray: The weighted mistakes after splitting on each feature.
+
+        """
+        return self.weighted_split_mistakes_from_sums(self.weighted_label_sums(feature_matrix, labels, data_weights))
+
+    @staticmethod
+    def weighted_label_sums(feature_matrix, labels, data_weights):
+        """Sum the weights of each label in the right split and the left split of every feature.
+
+        Sum the weights with matrix products, weighted_classes^T * feature_matrix for the right split (feature value
+        is 1) and weighted_classes^T * (1 - feature_matrix) for the left split (feature value is 0), where
+        weighted_classes has a column of the weights of each label. Both sides are sums over the data points of the
+        side, so two features that split the data the same way have exactly the same sums.
+
+        Args:
+            feature_matrix (numpy.ndarray): One hot encoded features (0 or 1), one row per data point, and one column
+                per feature.
+            labels (numpy.ndarray): Array of labels (1 or -1).
+            data_weights (numpy.ndarray): Weights of the data points.
+
+        Returns:
+            numpy.ndarray: The weighted label sums, where index 0 is the right split, index 1 is the left split, and
+                each split has a row of the weights of the 1's, a row of the weights of the -1's, and one column per
+                feature.
+
+        """
+        # Create a column of the weights of each label, 1 and -1
+        weighted_classes = np.zeros((len(labels), 2))
+        weighted_classes[labels == 1, 0] = data_weights[labels == 1]
+        weighted_classes[labels != 1, 1] = data_weights[labels != 1]
+
+        # Sum the weights of the 1's and -1's in the right split and the left split of every feature
+        return np.array([weighted_classes.T.dot(feature_matrix), weighted_classes.T.dot(1. - feature_matrix)])
+
+    @staticmethod
+    def weighted_split_mistakes_from_sums(label_sums):
+        """Compute the weighted mistakes of splitting on each feature from the weighted label sums.
+
+        Args:
+            label_sums (numpy.ndarray): The weighted label sums of each feature, see weighted_label_sums.
+
+        Returns:
+            numpy.ndarray: The weighted mistakes after splitting on each feature.
+
+        """
+        # The lowest weighted mistakes label of each split makes mistakes on the other label
+        return np.minimum(label_sums[1, 0], label_sums[1, 1]) + np.minimum(label_sums[0, 0], label_sums[0, 1])
 
     def create_leaf(self, data_labels, data_weights):
         """Create a leaf node for decision tree algorithm.
@@ -1,6 +1,5 @@
 """Implements WeightedLogisticRegression."""
 
-import math
 import numpy as np
 
 
@@ -52,11 +51,12 @@ class WeightedLogisticRegression:
             #           1
             # -------------------   = P(y=1|x_i,w)
             # 1 + exp(-w^t*h(x_i))
-            dot_product_results = np.apply_along_axis(lambda feature, coef: np.dot(np.transpose(coef), feature),
-                                                      1, feature_matrix, coefficients)
+
+            # Compute the scores w^t*h(x_i) for every row at once
+            dot_product_results = np.dot(feature_matrix, coefficients)
 
             # Compute P(y_i = +1 | x_i, w) using the link function
-            predictions = [1 / (1 + math.exp(-weight_dot_feature)) for weight_dot_feature in dot_product_results]
+            predictions = 1 / (1 + np.exp(-dot_product_results))
 
             # Compute indicator value for (y_i = +1)
             indicator = (label == +1)
@@ -70,6 +70,6 @@ class WeightedLogisticRegression:
             # the sigma function works on all the values for a specific column, and we will multiply each
             # row will error, then multiply by weights, which gives us Σ^N_i=1α(h_j(X_i))(1[y=+1]-P(y=1|x_i,w))
             coefficients = coefficients + model_parameters["step_size"] * np.dot(
-                model_parameters["weights_list"] * np.transpose(feature_matrix), errors)
+                np.transpose(feature_matrix), model_parameters["weights_list"] * errors)
 
         return coefficients
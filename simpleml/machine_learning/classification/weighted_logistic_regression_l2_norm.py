@@ -1,6 +1,5 @@
 """Implements WeightedLogisticRegressionL2Norm."""
 
-import math
 import numpy as np
 
 
@@ -54,11 +53,12 @@ class WeightedLogisticRegressionL2Norm:
             #           1
             # -------------------   = P(y=1|x_i,w)
             # 1 + exp(-w^t*h(x_i))
-            dot_products = np.apply_along_axis(lambda feature, coef: np.dot(np.transpose(coef), feature),
-                                               1, feature_matrix, coefficients)
+
+            # Compute the scores w^t*h(x_i) for every row at once
+            dot_products = np.dot(feature_matrix, coefficients)
 
             # Compute P(y_i = +1 | x_i, w) using the link function
-            predictions = [1 / (1 + math.exp(-coefficient_dot_feature)) for coefficient_dot_feature in dot_products]
+            predictions = 1 / (1 + np.exp(-dot_products))
 
             # Compute indicator value for (y_i = +1)
             indicator = (label == +1)
@@ -77,8 +77,8 @@ class WeightedLogisticRegressionL2Norm:
             # the sigma function works on all the values for a specific column, and we will multiply each
             # row will error, then multiply by weights, which gives us Σ^N_i=1α(h_j(X_i))(1[y=+1]-P(y=1|x_i,w))
             coefficients = coefficients + model_parameters["step_size"] * (np.dot(
-                model_parameters["weights_list"] * np.transpose(feature_matrix),
-                errors) - 2 * model_parameters["l2_penalty"] * coefficients)
+                np.transpose(feature_matrix),
+                model_parameters["weights_list"] * errors) - 2 * model_parameters["l2_penalty"] * coefficients)
 
             # The first coefficient should not be affected by L2 normalization
             coefficients[0] = intercept
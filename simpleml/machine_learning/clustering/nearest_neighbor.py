@@ -1,8 +1,14 @@
 """Implements Nearest Neighbor Clustering."""
 
 import math
+import time
 from collections import defaultdict
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
+from data_extraction.convert_sparse import ConvertSparse
 
 
 class NearestNeighbor:
@@ -12,47 +18,456 @@ class NearestNeighbor:
     The Nearest Neighbor is implemented by using a distance metric, such as euclidean or cosine similarity, and
     figures out the nearest neighbors with features such as bag of words or tf-idf.
 
+    Attributes:
+        convert_sparse (ConvertSparse): Class to convert bag of words or tf-idf dictionaries to a sparse matrix.
+
     """
 
-    def nearest_neighbors(self, data, label, feature, distance):
+    def __init__(self):
+        """Set up ConvertSparse class.
+
+        Constructor for NearestNeighbor, sets up the class to convert dictionary features to a sparse matrix.
+
+        """
+        self.convert_sparse = ConvertSparse()
+
+    def nearest_neighbors(self, data, label, feature, distance, block_size=128, top_k=None):
         """Compute nearest neighbors.
 
         Compute the nearest neighbors by using the label on data, which tells us the column of the data frame for
         querying, and the feature would be the name of the data frame that uses bag of words or tf-idf, uses the
         distance metric it would compute all of the distance compared to the query point.
 
+        The features are converted to one sparse matrix, and the distances are computed with blocked sparse matrix
+        products, see distance_matrix. If top_k is given, then only the top_k nearest references of each query are
+        kept, see k_nearest_neighbors.
+
         Args:
             data (pandas.DataFrame): Pandas data frame that holds our data.
             label (str): The name of the column that we want to query.
             feature (str): The column name of data that has feature.
-            distance (str): Distance metric name.
+            distance (str): Distance metric name, euclidean or cosine_similarity.
+            block_size (int): Amount of query rows to compute at once.
+            top_k (int): Amount of nearest references to keep for each query, or None to keep all of them.
 
         Returns:
             neighbors (pandas.DataFrame): A pandas data frame with label, reference, distance, where label is the
                 string in the label column, and the reference is the comparison label string, where distance is the
-                distance between them.
+                distance between them. If top_k is given, then the references of each query are sorted by distance.
+
+        """
+        # Convert the bag of words or tf-idf dictionaries to one csr matrix
+        feature_matrix, _ = self.convert_sparse.convert_to_csr(data[feature])
+        labels = data[label].values
+
+        if top_k is None:
+            # Compute the distances between all of the rows, and each query label is repeated for every reference
+            # label, and the reference labels are repeated for every query label, which matches the row major order
+            # of the distance matrix
+            distances = self.distance_matrix(feature_matrix, feature_matrix, distance, block_size).ravel()
+            query_indices = np.repeat(np.arange(len(labels)), len(labels))
+            reference_indices = np.tile(np.arange(len(labels)), len(labels))
+        else:
+            # Compute only the top_k nearest references for each row
+            query_indices, reference_indices, distances = self.k_nearest_neighbors(feature_matrix, feature_matrix,
+                                                                                   distance, top_k, block_size)
+
+        return pd.DataFrame({"query_label": labels[query_indices],
+                             "reference_label": labels[reference_indices],
+                             "distance": distances},
+                            columns=["query_label", "reference_label", "distance"],
+                            index=np.arange(1, len(distances) + 1))
+
+    def distance_matrix(self, query_matrix, reference_matrix, distance, block_size=128):
+        """Compute the distances between every query row and every reference row.
+
+        The distances are computed block by block, see distance_blocks, and stored in a preallocated matrix.
+
+        Args:
+            query_matrix (scipy.sparse.csr_matrix): Query rows, such as bag of words or tf-idf.
+            reference_matrix (scipy.sparse.csr_matrix): Reference rows, with the same columns as query_matrix.
+            distance (str): Distance metric name, euclidean or cosine_similarity.
+            block_size (int): Amount of query rows to compute at once.
+
+        Returns:
+            distances (numpy.ndarray): A matrix where row i holds the distances from query row i to each reference
+                row.
+
+        """
+        # Preallocate the result
+        distances = np.empty((query_matrix.shape[0], reference_matrix.shape[0]))
+
+        # Store each block of distances
+        for start, end, block_distances in self.distance_blocks(query_matrix, self.inverted_index(reference_matrix),
+                                                                distance, block_size):
+            distances[start:end] = block_distances
+
+        return distances
+
+    def k_nearest_neighbors(self, query_matrix, reference_matrix, distance, k, block_size=128):
+        """Compute the k nearest reference rows for every query row.
+
+        The distances are computed block by block, see distance_blocks, and only the k nearest references of each
+        query row are kept from each block, so the memory used is linear in the amount of query rows times k,
+        instead of query rows times reference rows.
+
+        Args:
+            query_matrix (scipy.sparse.csr_matrix): Query rows, such as bag of words or tf-idf.
+            reference_matrix (scipy.sparse.csr_matrix): Reference rows, with the same columns as query_matrix.
+            distance (str): Distance metric name, euclidean or cosine_similarity, where cosine_similarity is computed
+                with cosine_similarity_candidates.
+            k (int): Amount of nearest references to keep for each query row.
+            block_size (int): Amount of query rows to compute at once.
+
+        Returns:
+            A tuple of compact arrays, where the references of each query row are sorted by distance:
+                (
+                    query_indices (numpy.array): The query row index, each query row is repeated k times.
+                    reference_indices (numpy.array): The reference row index of the neighbor.
+                    distances (numpy.array): The distance between the query row and the reference row.
+                )
+
+        """
+        return self.k_nearest_neighbors_index(query_matrix, self.inverted_index(reference_matrix), distance, k,
+                                              block_size)
+
+    def k_nearest_neighbors_index(self, query_matrix, inverted_index, distance, k, block_size=128):
+        """Compute the k nearest reference rows for every query row with a prebuilt inverted index.
+
+        Same as k_nearest_neighbors, but the reference rows are given as an inverted index, see inverted_index, so
+        that the index can be built once and reused for many query matrices.
+
+        Args:
+            query_matrix (scipy.sparse.csr_matrix): Query rows, such as bag of words or tf-idf.
+            inverted_index (dict): Inverted index of the reference rows, see inverted_index.
+            distance (str): Distance metric name, euclidean or cosine_similarity, where cosine_similarity is computed
+                with cosine_similarity_candidates.
+            k (int): Amount of nearest references to keep for each query row.
+            block_size (int): Amount of query rows to compute at once.
+
+        Returns:
+            A tuple of compact arrays, where the references of each query row are sorted by distance:
+                (
+                    query_indices (numpy.array): The query row index, each query row is repeated k times.
+                    reference_indices (numpy.array): The reference row index of the neighbor.
+                    distances (numpy.array): The distance between the query row and the reference row.
+                )
+
+        """
+        # For cosine distances, only the references that share a word with the query need to be scored
+        if distance == "cosine_similarity":
+            return self.cosine_similarity_candidates(query_matrix, inverted_index, k, block_size)
+
+        # Can't keep more neighbors than there are reference rows
+        k = min(k, len(inverted_index["squared_norms"]))
+
+        # Preallocate the results, one row of k neighbors for each query row
+        reference_indices = np.empty((query_matrix.shape[0], k), dtype=np.int64)
+        distances = np.empty((query_matrix.shape[0], k))
+
+        # Keep the top k of each block of distances
+        for start, end, block_distances in self.distance_blocks(query_matrix, inverted_index, distance, block_size):
+            reference_indices[start:end], distances[start:end] = self.top_k(block_distances, k)
+
+        return np.repeat(np.arange(query_matrix.shape[0]), k), reference_indices.ravel(), distances.ravel()
+
+    def k_nearest_neighbors_parallel(self, query_matrix, reference_matrix, distance, k, model_parameters):
+        """Compute the k nearest reference rows for every query row with a pool of worker processes.
+
+        The query rows are split into blocks of rows, and each block is processed by a worker process with
+        k_nearest_neighbors_index. The query rows and the inverted index of the reference rows are placed in shared
+        memory once, so that the workers don't need a copy of them, and each block writes its top k results into a
+        shared output buffer. The progress and timing of each block is reported as the blocks finish.
+
+        Args:
+            query_matrix (scipy.sparse.csr_matrix): Query rows, such as bag of words or tf-idf.
+            reference_matrix (scipy.sparse.csr_matrix): Reference rows, with the same columns as query_matrix.
+            distance (str): Distance metric name, euclidean or cosine_similarity.
+            k (int): Amount of nearest references to keep for each query row.
+            model_parameters (dict): A dictionary of model parameters,
+                {
+                    block_size (int): Amount of query rows per block,
+                    processes (int): Amount of worker processes, None to use the amount of cores,
+                    progress (func): A function that is called with a dictionary for each finished block,
+                        {
+                            block (int): Block number,
+                            blocks (int): Total amount of blocks,
+                            finished (int): Amount of finished blocks,
+                            start (int): The first query row of the block,
+                            end (int): One past the last query row of the block,
+                            seconds (float): Time taken to compute the block
+                        }
+                        or None to not report the progress.
+                }
+
+        Returns:
+            A tuple of compact arrays, where the references of each query row are sorted by distance:
+                (
+                    query_indices (numpy.array): The query row index, each query row is repeated k times.
+                    reference_indices (numpy.array): The reference row index of the neighbor.
+                    distances (numpy.array): The distance between the query row and the reference row.
+                )
+
+        """
+        # Can't keep more neighbors than there are reference rows
+        k = min(k, reference_matrix.shape[0])
+        query_matrix = query_matrix.tocsr()
+        inverted_index = self.inverted_index(reference_matrix)
+
+        # The arrays that are placed in shared memory, the query and postings matrix are stored as the arrays of the
+        # csr format, and the output buffers are preallocated by the shared memory
+        arrays = {"query_data": query_matrix.data, "query_indices": query_matrix.indices,
+                  "query_indptr": query_matrix.indptr,
+                  "postings_data": inverted_index["postings"].data,
+                  "postings_indices": inverted_index["postings"].indices,
+                  "postings_indptr": inverted_index["postings"].indptr,
+                  "squared_norms": inverted_index["squared_norms"],
+                  "reference_indices": np.empty((query_matrix.shape[0], k), dtype=np.int64),
+                  "distances": np.empty((query_matrix.shape[0], k))}
+
+        # Split the query rows into blocks of rows
+        blocks = [(block, start, min(start + model_parameters["block_size"], query_matrix.shape[0]))
+                  for block, start in enumerate(range(0, query_matrix.shape[0], model_parameters["block_size"]))]
+
+        shared_memory = {}
+        try:
+            # Copy each array into shared memory, where the workers will only need the name, shape and type
+            specifications = {}
+            for name, array in arrays.items():
+                shared_memory[name] = SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shared_memory[name].buf)[...] = array
+                specifications[name] = (shared_memory[name].name, array.shape, array.dtype.str)
+
+            # Each worker attaches to the shared memory once, and then computes blocks of query rows
+            with Pool(model_parameters["processes"], initializer=attach_shared_memory,
+                      initargs=(specifications, {"query_shape": query_matrix.shape,
+                                                 "postings_shape": inverted_index["postings"].shape,
+                                                 "distance": distance, "k": k})) as pool:
+                for finished, (block, start, end, seconds) in enumerate(pool.imap_unordered(k_nearest_neighbors_block,
+                                                                                            blocks)):
+                    # Report the progress and timing of the finished block
+                    if model_parameters["progress"] is not None:
+                        model_parameters["progress"]({"block": block, "blocks": len(blocks),
+                                                      "finished": finished + 1, "start": start, "end": end,
+                                                      "seconds": seconds})
+
+            # Copy the results out of the shared output buffers
+            reference_indices = np.ndarray(arrays["reference_indices"].shape, dtype=np.int64,
+                                           buffer=shared_memory["reference_indices"].buf).ravel().copy()
+            distances = np.ndarray(arrays["distances"].shape, dtype=np.float64,
+                                   buffer=shared_memory["distances"].buf).ravel().copy()
+        finally:
+            # Free the shared memory
+            for memory in shared_memory.values():
+                memory.close()
+                memory.unlink()
+
+        return np.repeat(np.arange(query_matrix.shape[0]), k), reference_indices, distances
+
+    def inverted_index(self, reference_matrix):
+        """Build an inverted index of the reference rows.
+
+        The inverted index maps each word (column) to its postings, the reference rows that contain the word, with
+        the value of the word in that row. The squared norms of the reference rows are computed once and stored
+        with the postings.
+
+        Args:
+            reference_matrix (scipy.sparse.csr_matrix): Reference rows, such as bag of words or tf-idf.
+
+        Returns:
+            inverted_index (dict): A dictionary of the postings and norms,
+                {
+                    postings (scipy.sparse.csr_matrix): Row i holds the reference rows (columns) that contain word i,
+                    squared_norms (numpy.array): ||y||^2 for each reference row.
+                }
+
+        """
+        return {"postings": reference_matrix.transpose().tocsr(),
+                "squared_norms": self.squared_norms(reference_matrix)}
+
+    def cosine_similarity_candidates(self, query_matrix, inverted_index, k, block_size=128):
+        """Compute the k nearest reference rows for every query row by cosine distance.
+
+        Only the references that share at least one word with a query row are scored. Multiplying a block of query
+        rows with the postings walks the postings of each word in the query, and accumulates x^T*y only for the
+        references in those postings, so the result is sparse and contains the candidates of each query row.
+        References that share no word with the query row have a cosine distance of 1, and are only used if a
+        query row has less than k candidates.
+
+        Args:
+            query_matrix (scipy.sparse.csr_matrix): Query rows, such as bag of words or tf-idf.
+            inverted_index (dict): Inverted index of the reference rows, see inverted_index.
+            k (int): Amount of nearest references to keep for each query row.
+            block_size (int): Amount of query rows to compute at once.
+
+        Returns:
+            A tuple of compact arrays, where the references of each query row are sorted by distance:
+                (
+                    query_indices (numpy.array): The query row index, each query row is repeated k times.
+                    reference_indices (numpy.array): The reference row index of the neighbor.
+                    distances (numpy.array): The distance between the query row and the reference row.
+                )
+
+        """
+        # Can't keep more neighbors than there are reference rows
+        reference_norms = np.sqrt(inverted_index["squared_norms"])
+        k = min(k, len(reference_norms))
+
+        # Preallocate the results, one row of k neighbors for each query row
+        reference_indices = np.empty((query_matrix.shape[0], k), dtype=np.int64)
+        distances = np.empty((query_matrix.shape[0], k))
+
+        # Compute the norms ||x|| once for the query rows
+        query_norms = np.sqrt(self.squared_norms(query_matrix))
+
+        # Loop through the query rows block by block
+        for start in range(0, query_matrix.shape[0], block_size):
+            # Compute x^T*y for the candidates of each query row in the block
+            products = query_matrix[start:start + block_size] * inverted_index["postings"]
+
+            # Loop through each query row of the block
+            for row in range(products.shape[0]):
+                # Get the candidates of the row and their products
+                candidates = products.indices[products.indptr[row]:products.indptr[row + 1]]
+                candidate_products = products.data[products.indptr[row]:products.indptr[row + 1]]
+
+                # Compute cosine distance,       x^T*y
+                #                          1 - ------------
+                #                               ||x||*||y|
+                candidate_distances = 1 - candidate_products / (query_norms[start + row] * reference_norms[candidates])
+
+                # If there are not enough candidates, then fill with the first references that are not candidates,
+                # which have a cosine distance of 1
+                if len(candidates) < k:
+                    fill = np.setdiff1d(np.arange(min(k + len(candidates), len(reference_norms))),
+                                        candidates)[0:k - len(candidates)]
+                    candidates = np.concatenate([candidates, fill])
+                    candidate_distances = np.concatenate([candidate_distances, np.ones(len(fill))])
+
+                # Keep the k nearest candidates
+                top_indices, distances[start + row] = self.top_k(candidate_distances[np.newaxis, :], k)
+                reference_indices[start + row] = candidates[top_indices[0]]
+
+        return np.repeat(np.arange(query_matrix.shape[0]), k), reference_indices.ravel(), distances.ravel()
+
+    def distance_blocks(self, query_matrix, inverted_index, distance, block_size=128):
+        """Compute the distances between the query rows and the reference rows block by block.
+
+        Each block of query rows is multiplied with the postings of the reference rows (x^T*y for every pair), and
+        the distance metric is computed from the products and the norms of the rows. The norms are computed only
+        once.
+
+        Args:
+            query_matrix (scipy.sparse.csr_matrix): Query rows, such as bag of words or tf-idf.
+            inverted_index (dict): Inverted index of the reference rows, see inverted_index.
+            distance (str): Distance metric name, euclidean or cosine_similarity.
+            block_size (int): Amount of query rows to compute at once.
+
+        Yields:
+            A tuple of the block and its distances:
+                (
+                    start (int): The first query row of the block.
+                    end (int): One past the last query row of the block.
+                    block_distances (numpy.ndarray): The distances from each query row of the block to each
+                        reference row.
+                )
+
+        """
+        # Compute the squared norms ||x||^2 once for the query rows
+        query_squared_norms = self.squared_norms(query_matrix)
+
+        # Loop through the query rows block by block
+        for start in range(0, query_matrix.shape[0], block_size):
+            end = min(start + block_size, query_matrix.shape[0])
+
+            # Compute x^T*y for every query row in the block against every reference row
+            products = (query_matrix[start:end] * inverted_index["postings"]).toarray()
+
+            # Use the distance metric specified by the user to convert the products to distances
+            block_distances = getattr(self, distance + "_products")(products, query_squared_norms[start:end],
+                                                                    inverted_index["squared_norms"])
+            yield start, end, block_distances
+
+    @staticmethod
+    def top_k(distances, k):
+        """Select the k smallest distances of each row.
+
+        Uses a partial sort to find the k smallest distances of each row, and then sorts only those k distances.
+
+        Args:
+            distances (numpy.ndarray): Distances, one row per query.
+            k (int): Amount of distances to keep for each row.
+
+        Returns:
+            A tuple of the column indices and the distances of the k smallest distances of each row, sorted by
+            distance:
+                (
+                    indices (numpy.ndarray): Column indices, one row per query.
+                    distances (numpy.ndarray): Distances that correspond to indices.
+                )
 
         """
-        neighbors = pd.DataFrame(columns=["query_label", "reference_label", "distance"])
+        # Partition each row so that the first k columns are the k smallest distances
+        indices = np.argpartition(distances, k - 1, axis=1)[:, 0:k]
+        top_distances = np.take_along_axis(distances, indices, axis=1)
 
-        # Loop through each row in the data frame
-        for _, row_target in data.iterrows():
-            # Loop through each row in the data frame
-            for dummy_, row_compare in data.iterrows():
-                # Create a default dictionary and set the query_label as the value in the label column
-                comparison = defaultdict()
-                comparison["query_label"] = row_target[label]
+        # Sort the k smallest distances of each row
+        order = np.argsort(top_distances, axis=1, kind="stable")
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(top_distances, order, axis=1)
 
-                # The reference label would be the label value of the row
-                comparison["reference_label"] = row_compare[label]
+    @staticmethod
+    def squared_norms(feature_matrix):
+        """Compute the squared norm of each row.
 
-                # Use the distance metric specified by the user
-                comparison["distance"] = getattr(self, distance)(row_target[feature], row_compare[feature])
+        Compute ||x||^2 = Σ x_i^2 for each row of a sparse matrix.
 
-                # Append the new dictionary to the neighbors data frame
-                neighbors.loc[len(neighbors.index) + 1] = comparison
+        Args:
+            feature_matrix (scipy.sparse.csr_matrix): Bag of words or tf-idf rows.
+
+        Returns:
+            numpy.array: Squared norm of each row.
 
-        return neighbors
+        """
+        return np.asarray(feature_matrix.multiply(feature_matrix).sum(axis=1)).ravel()
+
+    @staticmethod
+    def euclidean_products(products, query_squared_norms, reference_squared_norms):
+        """Compute the euclidean distances from products.
+
+        The euclidean distance is computed as: √(||x||^2+||y||^2-2*x^T*y), which is equal to √Σ(x_i-y_i)^2.
+
+        Args:
+            products (numpy.ndarray): x^T*y for each query row (rows) and reference row (columns).
+            query_squared_norms (numpy.array): ||x||^2 for each query row.
+            reference_squared_norms (numpy.array): ||y||^2 for each reference row.
+
+        Returns:
+            numpy.ndarray: Euclidean distances.
+
+        """
+        # Compute ||x||^2+||y||^2-2*x^T*y, and clip small negative values caused by rounding
+        squared_distances = query_squared_norms[:, np.newaxis] + reference_squared_norms[np.newaxis, :] - 2 * products
+        return np.sqrt(np.maximum(squared_distances, 0))
+
+    @staticmethod
+    def cosine_similarity_products(products, query_squared_norms, reference_squared_norms):
+        """Compute the cosine distances from products.
+
+        The cosine distance is computed as:        x^T*y
+                                            1 - ------------
+                                                 ||x||*||y|
+
+        Args:
+            products (numpy.ndarray): x^T*y for each query row (rows) and reference row (columns).
+            query_squared_norms (numpy.array): ||x||^2 for each query row.
+            reference_squared_norms (numpy.array): ||y||^2 for each reference row.
+
+        Returns:
+            numpy.ndarray: Cosine distances.
+
+        """
+        return 1 - products / (np.sqrt(query_squared_norms)[:, np.newaxis] *
+                               np.sqrt(reference_squared_norms)[np.newaxis, :])
 
     @staticmethod
     def euclidean(target, compare):
@@ -76,37 +491,129 @@ class NearestNeighbor:
         return math.sqrt(sum([(target[word] - compare[word]) ** 2 for word in set(target).union(set(compare))]))
 
     @staticmethod
-    def cosine_similarity(target, compare):
+    def cosine_similarity(target, compare, target_norm=None, compare_norm=None):
         """Compute the cosine similarity between target and compare.
 
         The cosine similarity is computed as:        x^T*y
                                               1 - ------------
                                                    ||x||*||y|
         Where x^T*y is the multiplication of vectors x and y, essentially Σ x_i*y_i, and ||x|| is the normalization
-        of X, which is √(a_i)^2+(b_i)^2.
+        of X, which is √(a_i)^2+(b_i)^2. Only the words that are in both dictionaries contribute to x^T*y, and the
+        norms can be precomputed once with norm, instead of being recomputed for every pair.
 
         Args:
             target (dict): Bag of words or td-idf dictionary.
             compare (dict): Bag of words or td-idf dictionary.
+            target_norm (float): Precomputed ||x||, computed if None.
+            compare_norm (float): Precomputed ||y||, computed if None.
 
         Returns:
             float: Cosine distance.
 
         """
-        # Convert the default dictionary to a default dictionary
-        target = defaultdict(float, target)
-        compare = defaultdict(float, compare)
+        # Loop through the smaller dictionary, and look up the words in the larger dictionary
+        smaller, larger = (target, compare) if len(target) <= len(compare) else (compare, target)
 
         # Compute x^T*y
-        x_y = sum([(target[word] * compare[word]) for word in set(target).union(set(compare))])
+        x_y = sum([value * larger[word] for word, value in smaller.items() if word in larger])
 
         # Compute x norm, ||x||
-        x_norm = math.sqrt(sum([target[word] ** 2 for word in target]))
+        x_norm = NearestNeighbor.norm(target) if target_norm is None else target_norm
 
         # Compute y norm, ||y||
-        y_norm = math.sqrt(sum([compare[word] ** 2 for word in compare]))
+        y_norm = NearestNeighbor.norm(compare) if compare_norm is None else compare_norm
 
         # Compute cosine distance,       x^T*y
         #                          1 - ------------
         #                               ||x||*||y|
         return 1 - (x_y / (x_norm * y_norm))
+
+    @staticmethod
+    def norm(target):
+        """Compute the norm of a dictionary.
+
+        The norm is computed as: ||x|| = √(a_i)^2+(b_i)^2.
+
+        Args:
+            target (dict): Bag of words or td-idf dictionary.
+
+        Returns:
+            float: Norm of the dictionary.
+
+        """
+        return math.sqrt(sum([value ** 2 for value in target.values()]))
+
+
+# The shared memory and csr matrices of a worker process for k_nearest_neighbors_parallel, set by
+# attach_shared_memory when the worker process starts
+WORKER_STATE = {}
+
+
+def attach_shared_memory(specifications, parameters):
+    """Attach a worker process to the shared memory of k_nearest_neighbors_parallel.
+
+    Attaches to each shared array, and builds the query matrix and the inverted index of the reference rows on top of
+    the shared arrays without copying them.
+
+    Args:
+        specifications (dict): A dictionary of array name to a tuple of (shared memory name, shape, type).
+        parameters (dict): A dictionary of parameters,
+            {
+                query_shape (tuple): Shape of the query matrix,
+                postings_shape (tuple): Shape of the postings matrix,
+                distance (str): Distance metric name,
+                k (int): Amount of nearest references to keep for each query row.
+            }
+
+    """
+    # Attach to each shared array, the shared memory has to be kept open for the arrays to be valid
+    arrays = {}
+    WORKER_STATE["shared_memory"] = {}
+    for name, (memory_name, shape, dtype) in specifications.items():
+        WORKER_STATE["shared_memory"][name] = SharedMemory(name=memory_name)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=WORKER_STATE["shared_memory"][name].buf)
+
+    # Build the csr matrices on top of the shared arrays
+    WORKER_STATE["query_matrix"] = csr_matrix((arrays["query_data"], arrays["query_indices"],
+                                               arrays["query_indptr"]), shape=parameters["query_shape"], copy=False)
+    WORKER_STATE["inverted_index"] = {"postings": csr_matrix((arrays["postings_data"], arrays["postings_indices"],
+                                                              arrays["postings_indptr"]),
+                                                             shape=parameters["postings_shape"], copy=False),
+                                      "squared_norms": arrays["squared_norms"]}
+    WORKER_STATE["reference_indices"] = arrays["reference_indices"]
+    WORKER_STATE["distances"] = arrays["distances"]
+    WORKER_STATE["parameters"] = parameters
+    WORKER_STATE["nearest_neighbor"] = NearestNeighbor()
+
+
+def k_nearest_neighbors_block(block):
+    """Compute the k nearest reference rows for a block of query rows in a worker process.
+
+    Computes the block with k_nearest_neighbors_index, and writes the results into the shared output buffers.
+
+    Args:
+        block (tuple): A tuple of (block number, first query row, one past the last query row).
+
+    Returns:
+        A tuple of the block and the time taken:
+            (
+                block (int): Block number.
+                start (int): The first query row of the block.
+                end (int): One past the last query row of the block.
+                seconds (float): Time taken to compute the block.
+            )
+
+    """
+    block, start, end = block
+    start_time = time.perf_counter()
+
+    # Compute the k nearest neighbors of the block, the block is computed at once
+    _, reference_indices, distances = WORKER_STATE["nearest_neighbor"].k_nearest_neighbors_index(
+        WORKER_STATE["query_matrix"][start:end], WORKER_STATE["inverted_index"],
+        WORKER_STATE["parameters"]["distance"], WORKER_STATE["parameters"]["k"], end - start)
+
+    # Write the results to the rows of the block in the shared output buffers
+    WORKER_STATE["reference_indices"][start:end] = reference_indices.reshape(end - start, -1)
+    WORKER_STATE["distances"][start:end] = distances.reshape(end - start, -1)
+
+    return block, start, end, time.perf_counter() - start_time
@@ -45,10 +45,22 @@ class AdaBoost:
             model_dict (dict): A dictionary that stores data about weighted model,
                 {
                     predict_method  (func): Function to predict output.
+                    batch_predict_method (func): Function to predict the output of every data point at once, such
+                        as PredictOutput.binary_tree_batch, optional, used instead of predict_method if given.
                     model (obj): A model that contains a predict function to predict the output based on some input
                         features.
                     model_method (function): Model's function to generate a model.
                     model_parameters (dict): Model parameters for the model, such as depth to train for a decision tree.
+                    training_predictions (list): A list that the predictions of each model on the training data are
+                        appended to, optional, so that the predictions don't have to be computed again.
+                    validation_data (pandas.DataFrame): Validation data with the target, optional, see
+                        staged_validation_error.
+                    validation_errors (list): A list that the validation error of the ensemble after each iteration
+                        is appended to, optional.
+                    patience (int): Stop early if the validation error has not improved for patience iterations,
+                        optional, and keep the models up to the lowest validation error, see best_iteration.
+                    min_improvement (float): The amount that the validation error has to decrease to be an
+                        improvement, optional, 0 by default.
                 }
 
         Returns:
@@ -62,7 +74,7 @@ class AdaBoost:
 
         """
         # Each row of data (training data), has an alpha
-        alpha = pd.Series(data=[1] * len(data))
+        alpha = np.ones(len(data))
 
         # Initialize a list of weights
         weights_list = []
@@ -71,31 +83,49 @@ class AdaBoost:
         models_list = []
 
         # Get the column of data that includes our training output
-        target_values = data[target]
+        target_values = data[target].values
+
+        # Scores of the ensemble on the validation data, which are updated after each iteration
+        validation_errors = model_dict.get("validation_errors", [])
+        if "validation_data" in model_dict:
+            validation_scores = np.zeros(len(model_dict["validation_data"]))
 
         # Loop through each iteration, and generate one model per generation
         for _ in range(iterations):
-            # Use the model to generate a model, the output will be a decision tree
+            # Use the model to generate a model, the output will be a decision tree, where the weights are a series
+            # with the index of data, so that the weights can be split with the rows of data
             generated_model = getattr(model_dict["model"],
                                       model_dict["model_method"])(**{"data": data,
                                                                      "features": features,
                                                                      "target": target},
                                                                   model_parameters={**model_dict["model_parameters"],
-                                                                                    **{"data_weights": alpha}})
+                                                                                    **{"data_weights": pd.Series(
+                                                                                        alpha, index=data.index)}})
 
             # Insert the new model to the models list
             models_list.append(generated_model)
 
-            # Make predictions
-            predictions = data.apply(lambda x, gm=generated_model: model_dict["predict_method"](gm, x), axis=1)
+            # Make predictions, for every data point at once if the model has a batch prediction method
+            if "batch_predict_method" in model_dict:
+                predictions = np.asarray(model_dict["batch_predict_method"](generated_model, data))
+            else:
+                predictions = data.apply(lambda x, gm=generated_model: model_dict["predict_method"](gm, x),
+                                         axis=1).values
+
+            # Cache the training predictions of the model if a list is given
+            if "training_predictions" in model_dict:
+                model_dict["training_predictions"].append(predictions)
+
+            # Creating an array of boolean values indicating if each data was correctly classified
+            correct = predictions == target_values
 
             # Compute the weighted_error(f_t(x))
             # Weighted Error =    total weight of mistakes
             #                  -------------------------------
             #                  total weight of all data points
             # Best Possible Error: 0, Worst: 1.0, Random Classifier: 0.5
-            # alpha[(predictions != target_values)] = alpha[indexes of alpha which predictions are wrong]
-            weighted_error = sum(alpha[(predictions != target_values)]) / sum(alpha)
+            # alpha[~correct] = alpha[indexes of alpha which predictions are wrong]
+            weighted_error = np.sum(alpha[~correct]) / np.sum(alpha)
 
             # Compute w_t = w_t=1*ln(1-weighted_error(f_t))
             #                   -    ---------------------
@@ -108,6 +138,22 @@ class AdaBoost:
             # Add the new weight to our weights list
             weights_list.append(weight)
 
+            # Add the new model to the scores of the validation data, and stop early if the validation error has
+            # not improved for patience iterations
+            if "validation_data" in model_dict:
+                validation_data = model_dict["validation_data"]
+                if "batch_predict_method" in model_dict:
+                    validation_predictions = np.asarray(model_dict["batch_predict_method"](generated_model,
+                                                                                           validation_data))
+                else:
+                    validation_predictions = validation_data.apply(
+                        lambda x, gm=generated_model: model_dict["predict_method"](gm, x), axis=1).values
+                validation_errors.append(AdaBoost.staged_validation_error(validation_scores, weight,
+                                                                          validation_predictions,
+                                                                          validation_data[target].values))
+                if AdaBoost.stop_early(validation_errors, weights_list, models_list, model_dict):
+                    break
+
             # Recompute weights α_i, where α_i = α_i*e^-w_t, if f_t(x)=y_i (the prediction is correct)
             #                                    α_i*e^w_t, if f_t(x)=/=y_i (the prediction is not correct)
             # If f_t classifier got the prediction correct at a point:
@@ -118,18 +164,13 @@ class AdaBoost:
             #   If w_t is high (2.3), then we multiply α by e^(2.3)=9.98, which means we will increase the importance
             #   of α for that specific row of data.
             #   If w_t is low (0), then we will multiply α by e^(0)=1, then we will keep the importance the same.
-            # Note that (predictions == target_values) is the indexes of alpha which are correct.
-            exponential_weight = (predictions == target_values).apply(
-                lambda is_correct, w=weight: math.exp(-w) if is_correct else math.exp(w)
-            )
-
             # Scale alpha by multiplying by exponential_weight
-            alpha = alpha * exponential_weight
+            alpha *= np.where(correct, math.exp(-weight), math.exp(weight))
 
             # Normalize the weights α_i =        α_i
             #                            ---------------------
             #                            sum(α_j, for all α's)
-            alpha = alpha / sum(alpha)
+            alpha /= np.sum(alpha)
 
         return weights_list, models_list
 
@@ -151,6 +192,19 @@ class AdaBoost:
                         some input features,
                     model_method (function): Model's function to generate a model,
                     model_parameters (dict): Model parameters for the model, such as step size,
+                    validation_feature_matrix (numpy.matrix): Features of a validation dataset, optional, see
+                        staged_validation_error.
+                    validation_label (numpy.array): The label of the validation dataset, optional.
+                    validation_errors (list): A list that the validation error of the ensemble after each iteration
+                        is appended to, optional.
+                    patience (int): Stop early if the validation error has not improved for patience iterations,
+                        optional, and keep the models up to the lowest validation error, see best_iteration.
+                    min_improvement (float): The amount that the validation error has to decrease to be an
+                        improvement, optional, 0 by default.
+                    warm_start (bool): If True, each model starts from the coefficients of the previous model instead
+                        of initial_coefficients, optional, False by default.
+                    round_max_iter (int): The amount of iterations (max_iter) of every model after the first, so that
+                        warm started models only refine the previous coefficients, optional, max_iter by default.
                 }
 
         Returns:
@@ -164,7 +218,10 @@ class AdaBoost:
 
         """
         # Each row of data (training data), has an alpha
-        alpha = np.array([1] * len(feature_matrix))
+        alpha = np.ones(len(feature_matrix))
+
+        # The model parameters of the first model
+        model_parameters = dict(model_dict["model_parameters"])
 
         # Initialize a list of weights
         weights_list = []
@@ -172,31 +229,41 @@ class AdaBoost:
         # Initialize a list of models
         models_list = []
 
+        # Scores of the ensemble on the validation data, which are updated after each iteration
+        validation_errors = model_dict.get("validation_errors", [])
+        if "validation_feature_matrix" in model_dict:
+            validation_scores = np.zeros(len(model_dict["validation_feature_matrix"]))
+
         # Loop through each iteration, and generate one model per generation
         for _ in range(iterations):
             # Use the model to generate a model, the output will be coefficients
             generated_model = getattr(model_dict["model"],
                                       model_dict["model_method"])(**{"feature_matrix": feature_matrix,
                                                                      "label": label},
-                                                                  model_parameters={**model_dict["model_parameters"],
+                                                                  model_parameters={**model_parameters,
                                                                                     **{"weights_list": alpha}})
 
             # Insert the new model to the models list
             models_list.append(generated_model)
 
+            # Start the next model from the coefficients of this model, and give it the budget of one round
+            if model_dict.get("warm_start", False):
+                model_parameters["initial_coefficients"] = generated_model
+            if "round_max_iter" in model_dict:
+                model_parameters["max_iter"] = model_dict["round_max_iter"]
+
             # Make predictions
             predictions = model_dict["predict_method"](feature_matrix, generated_model)
 
             # Creating an array of boolean values indicating if each data was correctly classified
             correct = predictions == label
-            wrong = predictions != label
 
             # Compute the weighted_error(f_t(x))
             # Weighted Error =    total weight of mistakes
             #                  -------------------------------
             #                  total weight of all data points
             # Best Possible Error: 0, Worst: 1.0, Random Classifier: 0.5
-            weighted_error = sum(alpha[wrong]) / sum(alpha)
+            weighted_error = np.sum(alpha[~correct]) / np.sum(alpha)
 
             # Compute w_t = w_t=1*ln(1-weighted_error(f_t))
             #                   -    ----------------------
@@ -209,6 +276,16 @@ class AdaBoost:
             # Add the new weight to our weights list
             weights_list.append(weight)
 
+            # Add the new model to the scores of the validation data, and stop early if the validation error has
+            # not improved for patience iterations
+            if "validation_feature_matrix" in model_dict:
+                validation_errors.append(AdaBoost.staged_validation_error(
+                    validation_scores, weight,
+                    model_dict["predict_method"](model_dict["validation_feature_matrix"], generated_model),
+                    model_dict["validation_label"]))
+                if AdaBoost.stop_early(validation_errors, weights_list, models_list, model_dict):
+                    break
+
             # Recompute weights α_i, where α_i = α_i*e^-w_t, if f_t(x)=y_i (the prediction is correct)
             #                                    α_i*e^w_t, if f_t(x)=/=y_i (the prediction is not correct)
             # If f_t classifier got the prediction correct at a point:
@@ -219,14 +296,83 @@ class AdaBoost:
             #   If w_t is high (2.3), then we multiply α by e^(2.3)=9.98, which means we will increase the importance
             #   of α for that specific row of data.
             #   If w_t is low (0), then we will multiply α by e^(0)=1, then we will keep the importance the same.
-            exponential_weight = np.array([math.exp(-weight) if i else math.exp(weight) for i in correct])
-
             # Scale alpha by multiplying by exponential_weight
-            alpha = alpha * exponential_weight
+            alpha = alpha * np.where(correct, math.exp(-weight), math.exp(weight))
 
             # Normalize the weights α_i =        α_i
             #                            ---------------------
             #                            sum(α_j, for all α's)
-            alpha = alpha / sum(alpha)
+            alpha = alpha / np.sum(alpha)
 
         return weights_list, models_list
+
+    @staticmethod
+    def staged_validation_error(validation_scores, weight, validation_predictions, validation_labels):
+        """Add a new model to the scores of the validation data, and compute the validation error of the ensemble.
+
+        The scores of the ensemble are the weighted sum of the predictions of the models, Σ w_t*f_t(x), so adding the
+        weighted predictions of the new model gives the scores of the ensemble after each iteration, without
+        predicting with the previous models again.
+
+        Args:
+            validation_scores (numpy.ndarray): The scores of the ensemble on the validation data, updated in place.
+            weight (float): The weight of the new model.
+            validation_predictions (numpy.ndarray): The predictions of the new model on the validation data.
+            validation_labels (numpy.ndarray): The labels of the validation data.
+
+        Returns:
+            float: The fraction of the validation data that the ensemble classifies incorrectly.
+
+        """
+        # Add the weighted predictions of the new model
+        validation_scores += weight * np.asarray(validation_predictions, dtype=np.float64)
+
+        # The ensemble predicts +1 if the score is positive, otherwise -1
+        return float(np.count_nonzero(np.where(validation_scores > 0, 1, -1) != np.asarray(validation_labels))) / \
+            len(validation_scores)
+
+    @staticmethod
+    def best_iteration(validation_errors, min_improvement=0.):
+        """Find the iteration with the lowest validation error.
+
+        Args:
+            validation_errors (list of float): The validation error of the ensemble after each iteration.
+            min_improvement (float): The amount that the validation error has to decrease to be an improvement.
+
+        Returns:
+            int: The index of the first iteration whose validation error is not improved by any later iteration.
+
+        """
+        # Keep the first iteration of the lowest error, and only move on if the error decreases enough
+        best = 0
+        for iteration, validation_error in enumerate(validation_errors):
+            if validation_error < validation_errors[best] - min_improvement:
+                best = iteration
+        return best
+
+    @staticmethod
+    def stop_early(validation_errors, weights_list, models_list, model_dict):
+        """Decide if boosting stops early, and remove the models after the lowest validation error if it does.
+
+        Args:
+            validation_errors (list of float): The validation error of the ensemble after each iteration.
+            weights_list (list of float): The weights of the models, truncated in place if boosting stops.
+            models_list (list of obj): The models, truncated in place if boosting stops.
+            model_dict (dict): A dictionary that stores data about weighted model, where patience (int) and
+                min_improvement (float) are optional, see decision_tree.
+
+        Returns:
+            bool: True if the validation error has not improved for patience iterations.
+
+        """
+        # Without patience boosting never stops early
+        if "patience" not in model_dict:
+            return False
+
+        # Stop if the best iteration is patience iterations ago, and keep the models up to the best iteration
+        best = AdaBoost.best_iteration(validation_errors, model_dict.get("min_improvement", 0.))
+        if len(validation_errors) - 1 - best < model_dict["patience"]:
+            return False
+        del weights_list[best + 1:]
+        del models_list[best + 1:]
+        return True
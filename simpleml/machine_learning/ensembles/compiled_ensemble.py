@@ -0,0 +1,144 @@
+"""Implements CompiledEnsemble."""
+
+import numpy as np
+from machine_learning.classification.compiled_tree import CompiledTree
+
+
+class CompiledEnsemble:
+
+    """A weighted ensemble of decision trees flattened into parallel numpy arrays.
+
+    Compiles the decision trees and weights of AdaBoost into one set of arrays, where the nodes of every tree are
+    stored one tree after another, as in CompiledTree, and the children of a node are indices of the same arrays. The
+    leaves store the weighted vote of their tree, weight*prediction, so that the score of a data point is the sum of
+    the leaves that it reaches, one per tree.
+
+    Attributes:
+        features (list of str): The features that the trees can split on, the splitting feature of a node is an index
+            of this list.
+        roots (numpy.ndarray): The index of the root of each tree.
+        splitting_feature (numpy.ndarray): The index of the splitting feature of each node, -1 for leaves.
+        left (numpy.ndarray): The index of the left child (feature value is 0) of each node, -1 for leaves.
+        right (numpy.ndarray): The index of the right child (feature value is 1) of each node, -1 for leaves.
+        threshold (numpy.ndarray): The threshold of each node that splits on a real valued feature, where the left
+            child has the values that are less than or equal to the threshold, NaN for other nodes.
+        votes (numpy.ndarray): The weighted vote of each leaf, weight*prediction, 0 for intermediate nodes.
+
+    """
+
+    def __init__(self):
+        """Set up CompiledEnsemble.
+
+        Creates an empty ensemble, which is filled by compile.
+
+        """
+        self.features = []
+        self.roots = np.zeros(0, dtype=np.int64)
+        self.splitting_feature = np.zeros(0, dtype=np.int32)
+        self.left = np.zeros(0, dtype=np.int32)
+        self.right = np.zeros(0, dtype=np.int32)
+        self.threshold = np.zeros(0)
+        self.votes = np.zeros(0)
+
+    def compile(self, models, weights, features=None):
+        """Compile decision trees and their weights into arrays.
+
+        Args:
+            models (list of dict or list of CompiledTree): The decision trees, in the dict format of
+                BinaryDecisionTrees and WeightedBinaryDecisionTrees, or compiled trees.
+            weights (list of float): The weight of each decision tree.
+            features (list of str): The features that the trees were trained on. If None, the features are the
+                splitting features of the trees, in the order that they are first seen.
+
+        Returns:
+            CompiledEnsemble: self, with the compiled ensemble.
+
+        """
+        # Compile each tree with its own features, and look up the index of each feature in the ensemble
+        compiled_trees = [model if isinstance(model, CompiledTree) else CompiledTree().compile(model)
+                          for model in models]
+        self.features = list(features) if features is not None else []
+        feature_indices = {feature: index for index, feature in enumerate(self.features)}
+        for compiled_tree in compiled_trees:
+            for feature in compiled_tree.features:
+                if feature not in feature_indices:
+                    if features is not None:
+                        raise ValueError("Unknown splitting feature: {}".format(feature))
+                    feature_indices[feature] = len(self.features)
+                    self.features.append(feature)
+
+        # The nodes of each tree start after the nodes of the previous trees
+        sizes = np.array([len(compiled_tree.left) for compiled_tree in compiled_trees], dtype=np.int64)
+        self.roots = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64) if len(sizes) \
+            else np.zeros(0, dtype=np.int64)
+
+        # Store the splitting features as indices of the features of the ensemble
+        self.splitting_feature = np.concatenate(
+            [np.where(compiled_tree.splitting_feature >= 0,
+                      np.array([feature_indices[feature] for feature in compiled_tree.features] + [-1],
+                               dtype=np.int32)[compiled_tree.splitting_feature], -1)
+             for compiled_tree in compiled_trees] + [np.zeros(0, dtype=np.int32)]).astype(np.int32)
+
+        # Shift the children of each tree by the index of its root, where leaves keep -1, with the same type as the
+        # children of CompiledTree
+        self.left = np.concatenate([np.where(compiled_tree.left >= 0, compiled_tree.left + root, -1)
+                                    for compiled_tree, root in zip(compiled_trees, self.roots)] +
+                                   [np.zeros(0, dtype=np.int32)]).astype(np.int32)
+        self.right = np.concatenate([np.where(compiled_tree.right >= 0, compiled_tree.right + root, -1)
+                                     for compiled_tree, root in zip(compiled_trees, self.roots)] +
+                                    [np.zeros(0, dtype=np.int32)]).astype(np.int32)
+        self.threshold = np.concatenate([compiled_tree.threshold for compiled_tree in compiled_trees] +
+                                        [np.zeros(0)]).astype(np.float64)
+
+        # Multiply the prediction of each leaf by the weight of its tree
+        self.votes = np.concatenate([np.where(compiled_tree.left < 0, compiled_tree.prediction * weight, 0.)
+                                     for compiled_tree, weight in zip(compiled_trees, weights)] +
+                                    [np.zeros(0)]).astype(np.float64)
+
+        return self
+
+    def decision_function(self, feature_matrix, chunk_size=10000):
+        """Compute the score (margin) of every data point, the sum of the weighted votes of the trees.
+
+        Routes every pair of a data point and a tree through the trees at once, one level at a time, see
+        CompiledTree.route. The data points are scored in chunks of chunk_size rows, so that the
+        memory of the pairs is bounded by chunk_size times the amount of trees.
+
+        Args:
+            feature_matrix (numpy.ndarray): The features of the data points, one row per data point, and one column
+                per feature of features.
+            chunk_size (int): The maximum amount of data points that are routed at once.
+
+        Returns:
+            numpy.ndarray: The score of each data point, where a positive score is a prediction of +1.
+
+        """
+        # Preallocate the scores of every data point
+        scores = np.zeros(len(feature_matrix))
+
+        # Score the data points in chunks
+        for start in range(0, len(feature_matrix), chunk_size):
+            chunk = feature_matrix[start:start + chunk_size]
+
+            # Route each pair of a tree and a data point from the root of the tree, one row of leaves per tree
+            leaves = CompiledTree.route(self, chunk, np.tile(np.arange(len(chunk)), len(self.roots)),
+                                        np.repeat(self.roots, len(chunk))).reshape(len(self.roots), len(chunk))
+
+            # Add the votes of the trees one tree after another, in the order of the trees
+            np.sum(self.votes[leaves], axis=0, out=scores[start:start + len(chunk)])
+
+        return scores
+
+    def predict(self, feature_matrix, chunk_size=10000):
+        """Predict the class of every data point, +1 if the score is positive, otherwise -1.
+
+        Args:
+            feature_matrix (numpy.ndarray): The features of the data points, one row per data point, and one column
+                per feature of features.
+            chunk_size (int): The maximum amount of data points that are routed at once, see decision_function.
+
+        Returns:
+            numpy.ndarray: The predicted class of each data point.
+
+        """
+        return np.where(self.decision_function(feature_matrix, chunk_size) > 0, 1, -1)
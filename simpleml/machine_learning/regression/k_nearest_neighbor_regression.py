@@ -8,7 +8,9 @@ class KNearestNeighborRegression:
 
     """Class that uses KNN to compute Regression.
 
-    This class uses K Nearest Neighbor to compute regression by utilizing Euclidean Distance.
+    This class uses K Nearest Neighbor to compute regression by utilizing Euclidean Distance. The outputs of the
+    neighbors can be averaged with a plain mean, weighted by inverse distance, or weighted by a kernel (gaussian
+    or epanechnikov), where the weighting is selected per call.
 
     Attributes:
         euclidean_distance (EuclideanDistance): EuclideanDistance class that provide a function to compute euclidean
@@ -44,17 +46,121 @@ class KNearestNeighborRegression:
         return np.argsort(self.euclidean_distance.euclidean_distance_cmp_one_value(feature_matrix_training,
                                                                                    feature_vector_query))[0:k]
 
-    def predict_k_nearest_neighbor_regression(self, k, feature_matrix_training, output_train, feature_vector_query):
+    def k_nearest_neighbor_regression_distances(self, k, feature_matrix_training, feature_matrix_query,
+                                                batch_size=64):
+        """Compute K Nearest neighbors and their distances for a set of query points.
+
+        Batch version of k_nearest_neighbor_regression, which also returns the distance to each neighbor so that
+        the distances from the neighbor search can be reused for weighting. The query points are processed in
+        batches of batch_size rows to bound the memory used for the distance computation.
+
+        Args:
+            k (int): Amount of neighbors.
+            feature_matrix_training (numpy.matrix): A matrix of training points.
+            feature_matrix_query (numpy.matrix): A matrix of query points, one query point per row.
+            batch_size (int): Amount of query points to compute distances for at once.
+
+        Returns:
+            A tuple that contains the indices and distances of the neighbors:
+                (
+                    indices (numpy.ndarray): Indices of feature_matrix_training that are closest to each query
+                        point in sorted order, one row per query point.
+                    distances (numpy.ndarray): Euclidean distances that correspond to indices.
+                )
+
+        """
+        # Preallocate the results, one row of k neighbors for each query point
+        k = min(k, len(feature_matrix_training))
+        indices = np.empty((len(feature_matrix_query), k), dtype=np.int64)
+        distances = np.empty((len(feature_matrix_query), k))
+
+        # Loop through the query points in batches
+        for start in range(0, len(feature_matrix_query), batch_size):
+            # Compute the euclidean distances of the batch against every training point
+            batch_distances = self.euclidean_distance.euclidean_distance_cmp_all_values(
+                feature_matrix_training, feature_matrix_query[start:start + batch_size])
+
+            # Select the k nearest neighbors of each row without sorting the whole row, then sort the k neighbors
+            # in ascending order of distance, and take the distances that correspond to those indices
+            batch_indices = np.argpartition(batch_distances, k - 1, axis=1)[:, 0:k] if k < batch_distances.shape[1] \
+                else np.tile(np.arange(batch_distances.shape[1]), (len(batch_distances), 1))
+            batch_indices = np.take_along_axis(batch_indices, np.argsort(np.take_along_axis(
+                batch_distances, batch_indices, axis=1), axis=1, kind="stable"), axis=1)
+            indices[start:start + batch_size] = batch_indices
+            distances[start:start + batch_size] = np.take_along_axis(batch_distances, batch_indices, axis=1)
+
+        return indices, distances
+
+    @staticmethod
+    def neighbor_weights(distances, weighting, bandwidth=None):
+        """Compute the weights of the neighbors from their distances.
+
+        The supported weightings are:
+            mean: Every neighbor has the same weight.
+            distance: Every neighbor is weighted by 1/distance, where neighbors with a distance of 0 take all of
+                the weight.
+            gaussian: Gaussian kernel, exp(-(distance/bandwidth)^2/2).
+            epanechnikov: Epanechnikov kernel, max(1-(distance/bandwidth)^2, 0).
+
+        Args:
+            distances (numpy.ndarray): Distances to the neighbors, one row per query point.
+            weighting (str): The name of the weighting, mean, distance, gaussian or epanechnikov.
+            bandwidth (float): Bandwidth of the kernel, if None the distance to the furthest (k-th) neighbor of
+                each query point is used.
+
+        Returns:
+            numpy.ndarray: Weights for each neighbor, the same shape as distances.
+
+        """
+        # Every neighbor has the same weight for the plain mean
+        if weighting == "mean":
+            return np.ones(distances.shape)
+
+        # Inverse distance weighting, where division by zero is handled afterwards
+        if weighting == "distance":
+            with np.errstate(divide="ignore"):
+                weights = 1. / distances
+
+            # If a query point has neighbors with a distance of 0, then only those neighbors are used
+            exact = distances == 0
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+            return weights
+
+        # For kernels, use the distance of the k-th neighbor as an adaptive bandwidth if none is given, and
+        # replace a bandwidth of 0 (all neighbors are at distance 0) with 1 to avoid dividing by zero
+        if bandwidth is None:
+            bandwidth = distances[:, -1:].copy()
+            bandwidth[bandwidth == 0] = 1.
+
+        # Compute the scaled distances, distance/bandwidth
+        scaled_distances = distances / bandwidth
+
+        # Gaussian kernel, exp(-(distance/bandwidth)^2/2)
+        if weighting == "gaussian":
+            return np.exp(-scaled_distances ** 2 / 2.)
+
+        # Epanechnikov kernel, max(1-(distance/bandwidth)^2, 0)
+        if weighting == "epanechnikov":
+            return np.maximum(1. - scaled_distances ** 2, 0.)
+
+        raise ValueError("Unknown weighting: {}".format(weighting))
+
+    def predict_k_nearest_neighbor_regression(self, k, feature_matrix_training, output_train, feature_vector_query,
+                                              weighting="mean", bandwidth=None):
         """Predict KNN output by taking average of K points.
 
         Predicts the output of the k_nearest_neighbor_regression by taking the mean of the result from
-        output where we get the indices from nearest knn.
+        output where we get the indices from nearest knn, or the weighted average if a weighting is given.
 
         Args:
             k (int): Amount of neighbors.
             feature_matrix_training (numpy.matrix) : A matrix of training points.
             feature_vector_query (numpy.array): Query point array.
             output_train (numpy.array): Outputs for training data.
+            weighting (str): How the outputs of the neighbors are averaged, mean, distance, gaussian or
+                epanechnikov, see neighbor_weights.
+            bandwidth (float): Bandwidth for the gaussian and epanechnikov kernels.
 
         Returns:
             float: Average value of the knn returned indexes.
@@ -62,29 +168,53 @@ class KNearestNeighborRegression:
         """
         # Compute the knn, then use the indices with the output to get the predicted values, and then
         # perform mean for all columns (axis=0)
-        return np.mean(output_train[self.k_nearest_neighbor_regression(k, feature_matrix_training,
-                                                                       feature_vector_query)],
-                       axis=0)
+        if weighting == "mean":
+            return np.mean(output_train[self.k_nearest_neighbor_regression(k, feature_matrix_training,
+                                                                           feature_vector_query)],
+                           axis=0)
+
+        # For weighted averages, compute the query point as a batch of one
+        return self.predict_k_nearest_neighbor_all_regression(k, feature_matrix_training, output_train,
+                                                              np.asarray(feature_vector_query)[np.newaxis, :],
+                                                              weighting, bandwidth)[0]
 
     def predict_k_nearest_neighbor_all_regression(self, k, feature_matrix_training, output_train,
-                                                  feature_matrix_query_set):
+                                                  feature_matrix_query_set, weighting="mean", bandwidth=None):
         """Predict KNN output for each query set.
 
-        Predict the output of multiple k_nearest_neighbor_regression by using the predict_k_nearest_neighbor_regression
-        function. Each row of the feature_matrix_query_set is computed for mean.
+        Predict the output for each row of the feature_matrix_query_set at once. The neighbors and their distances
+        are searched once, and the distances are reused to weight the outputs of the neighbors.
 
         Args:
             k (int): Amount of neighbors.
             feature_matrix_training (numpy.matrix): A matrix of training points.
-            feature_matrix_query_set (list of float) : A list of query points.
+            feature_matrix_query_set (numpy.matrix) : A matrix of query points.
             output_train (numpy.array): Outputs for training data.
+            weighting (str): How the outputs of the neighbors are averaged, mean, distance, gaussian or
+                epanechnikov, see neighbor_weights.
+            bandwidth (float): Bandwidth for the gaussian and epanechnikov kernels.
 
         Returns:
-            k_nn_predict_multiple (list): List of average value of the output using k_nn_indices that corresponds to
-                each query point.
+            numpy.array: Average value of the output of the neighbors that corresponds to each query point.
 
         """
-        # For each feature_matrix_query_set which are rows of query point, compute the average knn value\
-        # then return a list
-        return [self.predict_k_nearest_neighbor_regression(k, feature_matrix_training, output_train, vector_query)
-                for vector_query in feature_matrix_query_set]
+        # Search the neighbors of every query point, and get the outputs of the neighbors
+        indices, distances = self.k_nearest_neighbor_regression_distances(k, feature_matrix_training,
+                                                                          np.asarray(feature_matrix_query_set))
+        neighbor_outputs = output_train[indices]
+
+        # For the plain mean, there's no need to compute weights
+        if weighting == "mean":
+            return np.mean(neighbor_outputs, axis=1)
+
+        # Compute the weights from the distances of the neighbor search
+        weights = self.neighbor_weights(distances, weighting, bandwidth)
+
+        # If all the weights of a query point are 0 (all neighbors are outside of the kernel), then
+        # fall back to the plain mean
+        total_weights = np.sum(weights, axis=1)
+        weights[total_weights == 0] = 1.
+        total_weights[total_weights == 0] = weights.shape[1]
+
+        # Compute the weighted average, Σ(weight*output)/Σweight
+        return np.sum(weights * neighbor_outputs, axis=1) / total_weights
@@ -47,3 +47,39 @@ class EuclideanDistance:
         # from feature_vector_query, and add together, which forms a matrix with multiple rows that only
         # has one value. Then we take the square root for each row (axis=1)
         return np.sqrt(np.sum((feature_matrix_training - feature_vector_query) ** 2, axis=1))
+
+    @staticmethod
+    def euclidean_distance_cmp_all_values(feature_matrix_training, feature_matrix_query, block_elements=2 ** 22):
+        """Compute euclidean distances from a set of query points against a matrix.
+
+        Compute euclidean distances from every row of the query matrix to every row of the training matrix, which is
+        the batch version of euclidean_distance_cmp_one_value. The training rows are compared in blocks, so that the
+        (query, training, feature) differences of a block have at most block_elements values, instead of the
+        differences of the whole training matrix.
+
+        Args:
+            feature_matrix_training (numpy.matrix): The training set (or comparison we are going to make to).
+            feature_matrix_query (numpy.matrix): Query points, one query point per row.
+            block_elements (int): The maximum amount of differences that are computed at once.
+
+        Returns:
+            numpy.ndarray: A matrix of euclidean distances, where row i holds the distances from the i-th query
+                point to each row of feature_matrix_training.
+
+        """
+        feature_matrix_training = np.asarray(feature_matrix_training)
+        feature_matrix_query = np.asarray(feature_matrix_query)
+
+        # Preallocate the distances, and compute the amount of training rows per block
+        distances = np.empty((len(feature_matrix_query), len(feature_matrix_training)))
+        block_size = max(1, block_elements // max(1, feature_matrix_query.shape[0] * feature_matrix_query.shape[1]))
+
+        # Add a new axis to the query matrix so that numpy broadcasts each query point against each block of the
+        # training matrix, which forms a (query, training, feature) array. Then we sum over the features
+        # (axis=2) and take the square root
+        for start in range(0, len(feature_matrix_training), block_size):
+            distances[:, start:start + block_size] = np.sqrt(np.sum(
+                (feature_matrix_training[np.newaxis, start:start + block_size, :] -
+                 feature_matrix_query[:, np.newaxis, :]) ** 2, axis=2))
+
+        return distances
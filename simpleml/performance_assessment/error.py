@@ -1,5 +1,6 @@
 """Implements Error."""
 
+import numpy as np
 from performance_assessment.predict_output import PredictOutput
 
 
@@ -31,7 +32,7 @@ class Error:
                               # Total examples
 
         Args:
-            tree (dict): The top node of a binary tree, with the following dict format:
+            tree (dict or CompiledTree): The top node of a binary tree, with the following dict format:
                 {
                     'is_leaf' (bool): False,
                     'prediction' (NoneType): None,
@@ -39,6 +40,7 @@ class Error:
                     'left' (dict): left_tree,
                     'right' (dict): right_tree
                 }
+                or a compiled tree.
             data (pandas.DataFrame): A pandas frame that has the same features binary tree.
             target (str): The target we want to predict.
 
@@ -46,12 +48,12 @@ class Error:
             float: Clarification error.
 
         """
-        # Apply the classify(tree, x) to each row in your data
-        prediction = data.apply(lambda x: self.predict_output.binary_tree(tree, x), axis=1)
+        # Classify every row in your data at once
+        prediction = self.predict_output.binary_tree_batch(tree, data)
 
         # Once you've made the predictions, calculate the classification error and return it
         data["prediction"] = prediction
-        mistakes = data.apply(lambda x: x[target] != x["prediction"], axis=1).sum()
+        mistakes = np.count_nonzero(data[target].values != prediction)
 
         # Return mistakes/total examples
         return float(mistakes) / float(len(data))
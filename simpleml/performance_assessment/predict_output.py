@@ -2,6 +2,8 @@
 
 import numpy as np
 import pandas as pd
+from machine_learning.classification.compiled_tree import CompiledTree
+from machine_learning.ensembles.compiled_ensemble import CompiledEnsemble
 
 
 class PredictOutput:
@@ -30,27 +32,78 @@ class PredictOutput:
         return np.dot(feature_matrix, weights)
 
     @staticmethod
-    def logistic_regression(feature_matrix, coefficients, threshold=0):
+    def logistic_regression(feature_matrix, coefficients, threshold=0, chunk_size=None):
         """Predicts output for logistic regression.
 
-        Predicts output based on y_i = +1 hw >= 0
-                                       -1 hw <  0
+        Predicts output based on y_i = +1 hw >  threshold
+                                       -1 hw <= threshold
 
         Args:
             feature_matrix (numpy matrix): A numpy matrix containing features.
             coefficients (numpy array): A numpy array containing coefficients.
             threshold (int): A threshold to determine 1, or -1.
+            chunk_size (int): The amount of rows that are scored at once, see logistic_regression_decision_function.
 
         Returns:
             numpy.array: T(Hw), The feature matrix dot product with coefficients and then applied threshold if the
                 value is greater than 0, then return 1, else -1
 
         """
-        # The apply_threshold will create an array of 1 or -1 depending on the predictions
-        apply_threshold = np.vectorize(lambda x: 1. if x > threshold else -1.)
+        # Create an array of 1 or -1 depending on the scores
+        return np.where(PredictOutput.logistic_regression_decision_function(feature_matrix, coefficients,
+                                                                            chunk_size) > threshold, 1., -1.)
 
-        # Apply the apply_threshold to the predictions
-        return apply_threshold(np.dot(feature_matrix, coefficients))
+    @staticmethod
+    def logistic_regression_decision_function(feature_matrix, coefficients, chunk_size=None):
+        """Computes the scores of logistic regression, Hw.
+
+        The scores are shared by logistic_regression and logistic_regression_predict_proba. If chunk_size is given,
+        the rows are scored chunk_size rows at a time, so that feature matrices that don't fit in memory, such as a
+        numpy.memmap, are only read one chunk at a time.
+
+        Args:
+            feature_matrix (numpy matrix): A numpy matrix containing features.
+            coefficients (numpy array): A numpy array containing coefficients.
+            chunk_size (int): The amount of rows that are scored at once, all of the rows if None.
+
+        Returns:
+            numpy.array: Hw, the score of each row.
+
+        """
+        # Score every row at once
+        if chunk_size is None:
+            return np.asarray(np.dot(feature_matrix, coefficients)).ravel()
+
+        # Preallocate the scores, and score each chunk of rows
+        scores = np.empty(feature_matrix.shape[0])
+        for start in range(0, feature_matrix.shape[0], chunk_size):
+            scores[start:start + chunk_size] = np.asarray(np.dot(feature_matrix[start:start + chunk_size],
+                                                                 coefficients)).ravel()
+
+        return scores
+
+    @staticmethod
+    def logistic_regression_predict_proba(feature_matrix, coefficients, chunk_size=None):
+        """Predicts the probability of +1 for logistic regression.
+
+        Predicts the probability based on the link function,
+                    1
+        -------------------   = P(y=1|x_i,w)
+        1 + exp(-w^t*h(x_i))
+
+        Args:
+            feature_matrix (numpy matrix): A numpy matrix containing features.
+            coefficients (numpy array): A numpy array containing coefficients.
+            chunk_size (int): The amount of rows that are scored at once, see logistic_regression_decision_function.
+
+        Returns:
+            numpy.array: P(y=1|x_i,w) of each row.
+
+        """
+        # Compute the scores, where exp overflows to infinity for very negative scores, which is a probability of 0
+        scores = PredictOutput.logistic_regression_decision_function(feature_matrix, coefficients, chunk_size)
+        with np.errstate(over="ignore"):
+            return 1. / (1. + np.exp(-scores))
 
     def binary_tree(self, tree, data_point):
         """Predicts output for binary tree.
@@ -66,6 +119,7 @@ class PredictOutput:
                     'left' (dict): left_tree,
                     'right' (dict): right_tree
                 }
+                where a node that splits on a real valued feature also has 'threshold' (float).
             data_point (pandas.Series): A pandas series that contains features on the tree.
 
         Returns:
@@ -79,11 +133,69 @@ class PredictOutput:
         # Get the data point according to the splitting feature on the tree
         split_feature_value = data_point[tree['splitting_feature']]
 
+        # If the node has a threshold, and the value is less than or equal to the threshold, then go to the left
+        if 'threshold' in tree:
+            if split_feature_value <= tree['threshold']:
+                return self.binary_tree(tree['left'], data_point)
+            return self.binary_tree(tree['right'], data_point)
+
         # If value is equal to 0, then go the left, otherwise right
         if split_feature_value == 0:
             return self.binary_tree(tree['left'], data_point)
         return self.binary_tree(tree['right'], data_point)
 
+    def binary_tree_batch(self, tree, data):
+        """Predicts output for binary tree for every data point at once.
+
+        Classifies every data point of a pandas frame, by compiling the tree into arrays, see CompiledTree, and
+        routing all of the data points through the tree at once, see compiled_tree_batch. The predictions are the same
+        as binary_tree.
+
+        Args:
+            tree (dict or CompiledTree): The top node of a binary tree, with the following dict format:
+                {
+                    'is_leaf' (bool): False,
+                    'prediction' (NoneType): None,
+                    'splitting_feature' (str): splitting_feature,
+                    'left' (dict): left_tree,
+                    'right' (dict): right_tree
+                }
+                or a compiled tree.
+            data (pandas.DataFrame): A pandas frame that contains the features of the tree.
+
+        Returns:
+            numpy.ndarray: The predicted class of each data point.
+
+        """
+        # Compile the tree with only the features that it splits on
+        compiled_tree = tree if isinstance(tree, CompiledTree) else CompiledTree().compile(tree)
+
+        # Only the features of the tree are converted to a numpy matrix
+        return self.compiled_tree_batch(compiled_tree, data[compiled_tree.features].values)
+
+    @staticmethod
+    def compiled_tree_batch(compiled_tree, feature_matrix):
+        """Predicts output for a compiled binary tree for every data point at once.
+
+        Routes every data point through the tree one level at a time, starting at the root, see CompiledTree.route.
+        Hence the amount of numpy operations is proportional to the depth of the tree rather than the amount of data
+        points.
+
+        Args:
+            compiled_tree (CompiledTree): A compiled binary tree.
+            feature_matrix (numpy.ndarray): The features of the data points, one row per data point, and one column
+                per feature of compiled_tree.features.
+
+        Returns:
+            numpy.ndarray: The predicted class of each data point.
+
+        """
+        # Every data point starts at the root, node 0, and is routed to its leaf
+        leaves = CompiledTree.route(compiled_tree, feature_matrix, np.arange(len(feature_matrix)),
+                                    np.zeros(len(feature_matrix), dtype=np.int64))
+
+        return compiled_tree.prediction[leaves]
+
     @staticmethod
     def adaboost_binary_decision_tree(prediction_method, models, weights, data):
         """Predicts output for adaboost with binary decision tree.
@@ -114,6 +226,34 @@ class PredictOutput:
         # Return the prediction of each data
         return scores.apply(lambda score: +1 if score > 0 else -1)
 
+    @staticmethod
+    def adaboost_binary_decision_tree_batch(models, weights, data, margins=False, chunk_size=10000):
+        """Predicts output for adaboost with binary decision tree for every data point at once.
+
+        Compiles the trees and weights into one set of arrays, see CompiledEnsemble, and scores every data point with
+        all of the trees at once. The predictions are the same as adaboost_binary_decision_tree.
+
+        Args:
+            models (list of dict or CompiledEnsemble): List of models computed by adaboost, or a compiled ensemble.
+            weights (list of float): List of weights computed by adaboost, ignored if models is a compiled ensemble.
+            data (pandas.DataFrame): A pandas frame that contains training/testing data.
+            margins (bool): If True, return the scores (sum of the weighted votes) instead of the predictions, such
+                as for calibration.
+            chunk_size (int): The maximum amount of data points that are scored at once.
+
+        Returns:
+            pandas.Series: Outputs (or scores) for each set of feature, with the index of data.
+
+        """
+        # Compile the ensemble with only the features that the trees split on
+        ensemble = models if isinstance(models, CompiledEnsemble) else CompiledEnsemble().compile(models, weights)
+
+        # Only the features of the ensemble are converted to a numpy matrix
+        scores = ensemble.decision_function(data[ensemble.features].values, chunk_size)
+
+        # Return the score or the prediction of each data
+        return pd.Series(scores if margins else np.where(scores > 0, 1, -1), index=data.index)
+
     @staticmethod
     def adaboost_logistic_regression(prediction_method, models, weights, feature_matrix):
         """Predicts output for adaboost with logistic regression.
@@ -1,11 +1,16 @@
 """Implements TestBinaryDecisionTrees Unittest."""
 
+import os
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
+from data_extraction.bitset_features import BitsetFeatures
 from performance_assessment.predict_output import PredictOutput
 from performance_assessment.accuracy import Accuracy
 from performance_assessment.error import Error
 from machine_learning.classification.binary_decision_trees import BinaryDecisionTrees
+from machine_learning.classification.compiled_tree import CompiledTree
 
 
 class TestBinaryDecisionTrees(unittest.TestCase):
@@ -237,3 +242,247 @@ class TestBinaryDecisionTrees(unittest.TestCase):
 
         # Assert that the classification should be 0.38162
         self.assertEqual(round(accuracy, 5), round(0.38162, 5))
+
+    def test_06_split_mistakes(self):
+        """Tests split mistakes for BinaryDecisionTrees class.
+
+        We will compare the mistakes of every feature computed at once with splitting the data on each feature.
+
+        """
+        # Compute the mistakes of every feature at once
+        mistakes = self.binary_decision_trees.split_mistakes(self.train_data[self.features].values.astype(np.float64),
+                                                             self.train_data[self.target].values)
+
+        # Assert that the mistakes are equal to the mistakes of splitting the data on each feature
+        for feature, feature_mistakes in zip(self.features, mistakes):
+            left_split = self.train_data[self.train_data[feature] == 0]
+            right_split = self.train_data[self.train_data[feature] == 1]
+            self.assertEqual(feature_mistakes,
+                             self.binary_decision_trees.intermediate_node_mistakes(left_split[self.target]) +
+                             self.binary_decision_trees.intermediate_node_mistakes(right_split[self.target]))
+
+        # Assert that the best feature is the first feature with the least mistakes
+        self.assertEqual(self.binary_decision_trees.best_feature(self.train_data, self.features, self.target),
+                         self.features[int(np.argmin(mistakes))])
+
+    def test_07_greedy_iterative(self):
+        """Tests greedy iterative function for BinaryDecisionTrees class.
+
+        We will assert that the iterative approach builds the same trees as the recursive approaches.
+
+        """
+        # Create decision trees with the recursive approach and the iterative approach, and assert they are equal
+        self.assertEqual(self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                     {"current_depth": 0, "max_depth": 6}),
+                         self.binary_decision_trees.greedy_recursive(self.train_data, self.features, self.target,
+                                                                     {"current_depth": 0, "max_depth": 6}))
+
+        # Create decision trees with early stopping, and assert they are equal
+        model_parameters = {"current_depth": 0, "max_depth": 6, "min_node_size": 100, "min_error_reduction": 0.0}
+        self.assertEqual(self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                     model_parameters),
+                         self.binary_decision_trees.greedy_recursive_early_stop(self.train_data, self.features,
+                                                                                self.target, model_parameters))
+
+        # Create a decision tree with high depth
+        decision_tree = self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                    {"current_depth": 0, "max_depth": 10000})
+
+        # Assert that the accuracy is the same as the recursive approach
+        self.assertEqual(round(self.error.binary_tree(decision_tree, self.test_data, self.target), 5),
+                         round(self.error.binary_tree(
+                             self.binary_decision_trees.greedy_recursive(self.train_data, self.features, self.target,
+                                                                         {"current_depth": 0, "max_depth": 10000}),
+                             self.test_data, self.target), 5))
+
+    def test_08_compiled_tree(self):
+        """Tests compiling a decision tree into arrays.
+
+        We will compile a decision tree, and assert that the arrays convert back to the same tree after saving and
+        loading.
+
+        """
+        # Create a decision tree, and compile it
+        decision_tree = self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                    {"current_depth": 0, "max_depth": 6})
+        compiled_tree = CompiledTree().compile(decision_tree, self.features)
+
+        # Assert that the root splits on a feature, and its left child directly follows it
+        self.assertEqual(self.features[compiled_tree.splitting_feature[0]], decision_tree['splitting_feature'])
+        self.assertEqual(compiled_tree.left[0], 1)
+
+        # Assert that the compiled tree converts back to the same tree
+        self.assertEqual(compiled_tree.to_dict(), decision_tree)
+
+        # Save and load the compiled tree, and assert that it's the same tree
+        with tempfile.TemporaryDirectory() as directory:
+            compiled_tree.save(os.path.join(directory, "tree.npz"))
+            loaded_tree = CompiledTree().load(os.path.join(directory, "tree.npz"))
+        self.assertEqual(loaded_tree.features, self.features)
+        self.assertEqual(loaded_tree.to_dict(), decision_tree)
+
+    def test_09_binary_tree_batch(self):
+        """Tests predicting every data point at once for a decision tree.
+
+        We will assert that the batch predictions are equal to predicting each data point.
+
+        """
+        # Create a decision tree
+        decision_tree = self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                    {"current_depth": 0, "max_depth": 10000})
+
+        # Get the classification result of each row, and of every row at once
+        classifications = self.test_data.apply(lambda x: self.predict_output.binary_tree(decision_tree, x), axis=1)
+        batch_classifications = self.predict_output.binary_tree_batch(decision_tree, self.test_data)
+
+        # Assert that the classifications are equal, also for the compiled tree
+        self.assertEqual(list(batch_classifications), list(classifications))
+        self.assertEqual(list(self.predict_output.binary_tree_batch(CompiledTree().compile(decision_tree),
+                                                                    self.test_data)),
+                         list(classifications))
+
+    def test_10_greedy_bitset(self):
+        """Tests greedy bitset function for BinaryDecisionTrees class.
+
+        We will assert that the bitset counts are equal to the counts of the features, and that the bitset approach
+        builds the same trees as the iterative approach.
+
+        """
+        # Pack the features into bitsets, and a set of data points
+        feature_matrix = self.train_data[self.features].values
+        bitset_features = BitsetFeatures().pack(feature_matrix)
+        mask = self.train_data[self.target].values == 1
+        bitset = bitset_features.pack_rows(mask)
+
+        # Assert that the set unpacks to the same data points, and that the counts of each feature are equal
+        self.assertEqual(list(bitset_features.unpack_rows(bitset)), list(mask))
+        self.assertEqual(list(bitset_features.feature_counts(bitset)), list(feature_matrix[mask].sum(axis=0)))
+        self.assertEqual(int(bitset_features.POPCOUNT_TABLE[bitset.view(np.uint8)].sum()), int(mask.sum()))
+
+        # Create decision trees with the iterative approach and the bitset approach, and assert they are equal
+        for model_parameters in [{"current_depth": 0, "max_depth": 10000},
+                                 {"current_depth": 0, "max_depth": 6, "min_node_size": 100,
+                                  "min_error_reduction": 0.0}]:
+            self.assertEqual(self.binary_decision_trees.greedy_bitset(self.train_data, self.features, self.target,
+                                                                      model_parameters),
+                             self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                         model_parameters))
+
+    def test_11_greedy_iterative_parallel(self):
+        """Tests greedy iterative function with a thread pool for BinaryDecisionTrees class.
+
+        We will assert that the trees built with threads are the same as the trees built without threads.
+
+        """
+        # Create a decision tree without threads
+        decision_tree = self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                    {"current_depth": 0, "max_depth": 10000})
+
+        # Create decision trees with threads, where small nodes build their subtree as one task
+        for workers, parallel_node_size in [(2, 1), (4, 1000), (4, 10 ** 9)]:
+            self.assertEqual(self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                         {"current_depth": 0, "max_depth": 10000,
+                                                                          "workers": workers,
+                                                                          "parallel_node_size": parallel_node_size}),
+                             decision_tree)
+
+    def test_12_greedy_threshold(self):
+        """Tests greedy threshold function for BinaryDecisionTrees class.
+
+        We will build a decision tree on a real valued feature, and assert that one hot encoded features build the
+        same tree as the iterative approach.
+
+        """
+        # Create a real valued grade, where A is 1 and G is 7
+        numeric_train_data = pd.DataFrame({"grade": sum((i + 1) * self.train_data["grade." + grade]
+                                                        for i, grade in enumerate("ABCDEFG")),
+                                           self.target: self.train_data[self.target]})
+
+        # Create a decision tree on the real valued grade
+        decision_tree = self.binary_decision_trees.greedy_threshold(numeric_train_data, ["grade"], self.target,
+                                                                    {"current_depth": 0, "max_depth": 6})
+
+        # Assert that the root splits the grades A and B from the rest, and that the grade is split again into A and B
+        self.assertEqual(decision_tree['splitting_feature'], "grade")
+        self.assertEqual(decision_tree['threshold'], 2.0)
+        self.assertEqual(decision_tree['left']['splitting_feature'], "grade")
+        self.assertEqual(decision_tree['left']['threshold'], 1.0)
+
+        # Assert that predicting every row at once is equal to predicting each row
+        self.assertEqual(list(self.predict_output.binary_tree_batch(decision_tree, numeric_train_data)),
+                         list(numeric_train_data.apply(lambda x: self.predict_output.binary_tree(decision_tree, x),
+                                                       axis=1)))
+
+        # Create decision trees with the threshold approach and the iterative approach on one hot encoded features
+        threshold_tree = self.binary_decision_trees.greedy_threshold(self.train_data, self.features, self.target,
+                                                                     {"current_depth": 0, "max_depth": 6})
+        iterative_tree = self.binary_decision_trees.greedy_iterative(self.train_data, self.features, self.target,
+                                                                     {"current_depth": 0, "max_depth": 6})
+
+        # Assert that the trees split on the same features, and make the same predictions
+        self.assertEqual(CompiledTree().compile(threshold_tree, self.features).splitting_feature.tolist(),
+                         CompiledTree().compile(iterative_tree, self.features).splitting_feature.tolist())
+        self.assertEqual(list(self.predict_output.binary_tree_batch(threshold_tree, self.test_data)),
+                         list(self.predict_output.binary_tree_batch(iterative_tree, self.test_data)))
+
+    def test_13_subtract_counts(self):
+        """Tests subtract counts function for BinaryDecisionTrees class.
+
+        We will assert that the statistics of the children from histogram subtraction are equal to the statistics that
+        are computed from the rows of each child.
+
+        """
+        # Split the data on the grade A
+        feature_matrix = self.train_data[self.features].values
+        labels = self.train_data[self.target].values
+        right_rows = np.flatnonzero(self.train_data["grade.A"].values == 1)
+        left_rows = np.flatnonzero(self.train_data["grade.A"].values == 0)
+
+        # Assert that the label counts of the children are equal, regardless of which child is subtracted
+        node_counts = self.binary_decision_trees.label_counts(feature_matrix, labels)
+        for left_is_smaller in [True, False]:
+            left_counts, right_counts = self.binary_decision_trees.subtract_counts(
+                node_counts, left_is_smaller, lambda rows: self.binary_decision_trees.label_counts(feature_matrix[rows],
+                                                                                                   labels[rows]),
+                left_rows, right_rows)
+            self.assertEqual(left_counts.tolist(),
+                             self.binary_decision_trees.label_counts(feature_matrix[left_rows],
+                                                                     labels[left_rows]).tolist())
+            self.assertEqual(right_counts.tolist(),
+                             self.binary_decision_trees.label_counts(feature_matrix[right_rows],
+                                                                     labels[right_rows]).tolist())
+
+        # Assert that the label histograms of the children are equal
+        binned_features, thresholds = self.binary_decision_trees.quantize_features(feature_matrix)
+        num_bins = max(len(feature_thresholds) for feature_thresholds in thresholds)
+        node_histograms = self.binary_decision_trees.label_histograms(binned_features, labels, num_bins)
+        left_histograms, right_histograms = self.binary_decision_trees.subtract_counts(
+            node_histograms, False, lambda rows: self.binary_decision_trees.label_histograms(binned_features[rows],
+                                                                                             labels[rows], num_bins),
+            left_rows, right_rows)
+        self.assertEqual(left_histograms.tolist(),
+                         self.binary_decision_trees.label_histograms(binned_features[left_rows], labels[left_rows],
+                                                                     num_bins).tolist())
+        self.assertEqual(right_histograms.tolist(),
+                         self.binary_decision_trees.label_histograms(binned_features[right_rows], labels[right_rows],
+                                                                     num_bins).tolist())
+
+    def test_14_quantize_features(self):
+        """Tests quantize features function for BinaryDecisionTrees class.
+
+        We will assert that the bins are stored in the smallest integer type that can store every bin, and that the
+        bins don't wrap around for more than 65536 bins.
+
+        """
+        # Create a real valued feature with 70000 distinct values
+        feature_matrix = np.arange(70000, 0, -1, dtype=np.float64)[:, np.newaxis]
+
+        # Assert the integer type of the bins
+        for max_bins, dtype in [(256, np.uint8), (257, np.uint16), (65536, np.uint16), (70000, np.uint32)]:
+            self.assertEqual(self.binary_decision_trees.quantize_features(feature_matrix[0:max_bins],
+                                                                          max_bins)[0].dtype, dtype)
+
+        # Assert that each distinct value has its own bin
+        binned_features, thresholds = self.binary_decision_trees.quantize_features(feature_matrix, 70000)
+        self.assertEqual(len(thresholds[0]), 70000)
+        self.assertEqual(binned_features[:, 0].tolist(), list(range(69999, -1, -1)))
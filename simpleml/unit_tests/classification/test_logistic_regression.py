@@ -373,3 +373,32 @@ class TestLogisticRegression(unittest.TestCase):
 
         # Assert the value
         self.assertEqual(round(lg, 5), round(-2.6657099999999998, 5))
+
+    def test_06_predict_proba(self):
+        """Test decision function, predict proba and predict output.
+
+        Test that the predictions and probabilities share the scores, with and without chunks, and compare them with
+        some known values.
+
+        """
+        # Generate test feature and coefficients
+        feature_matrix = np.array([[1., 2., 3.], [1., -1., -1]])
+        coefficients = np.array([1., 3., -1.])
+
+        # Compute the outputs with all of the rows at once, and one row at a time
+        for chunk_size in [None, 1]:
+            # Assert the scores
+            self.assertEqual(list(self.predict_output.logistic_regression_decision_function(feature_matrix,
+                                                                                            coefficients,
+                                                                                            chunk_size)),
+                             [4., -1.])
+
+            # Assert the probabilities
+            self.assertEqual([round(i, 5) for i in self.predict_output.logistic_regression_predict_proba(
+                                 feature_matrix, coefficients, chunk_size)],
+                             [round(0.98201379003, 5), round(0.26894142137, 5)])
+
+            # Assert the predictions
+            self.assertEqual(list(self.predict_output.logistic_regression(feature_matrix, coefficients, 0,
+                                                                          chunk_size)),
+                             [1., -1.])
@@ -1,11 +1,14 @@
 """Implements TestWeightedBinaryDecisionTrees Unittest."""
 
 import unittest
+import numpy as np
 import pandas as pd
 from performance_assessment.predict_output import PredictOutput
 from performance_assessment.accuracy import Accuracy
 from performance_assessment.error import Error
+from machine_learning.classification.compiled_tree import CompiledTree
 from machine_learning.classification.weighted_binary_decision_trees import WeightedBinaryDecisionTrees
+from machine_learning.ensembles.compiled_ensemble import CompiledEnsemble
 from machine_learning.ensembles.adaboost import AdaBoost
 
 
@@ -190,3 +193,222 @@ class TestWeightedBinaryDecisionTrees(unittest.TestCase):
                                                            self.target),
                                5),
                          round(0.620314519604, 5))
+
+    def test_06_compiled_tree(self):
+        """Tests compiling a weighted decision tree into arrays.
+
+        We will compile a weighted decision tree, and assert that the arrays convert back to the same tree.
+
+        """
+        # Create data weights
+        data_weights = pd.Series([1.] * 10 + [2.] * (len(self.train_data) - 20) + [-1.] * 10)
+
+        # Create a decision tree, and compile it
+        decision_tree = self.weighted_binary_decision_trees.greedy_recursive(self.train_data, self.features,
+                                                                             self.target,
+                                                                             {"data_weights": data_weights,
+                                                                              "current_depth": 0,
+                                                                              "max_depth": 4,
+                                                                              "minimum_error": 1e-15})
+        compiled_tree = CompiledTree().compile(decision_tree)
+
+        # Assert that the compiled tree converts back to the same tree
+        self.assertEqual(compiled_tree.to_dict(), decision_tree)
+
+    def test_07_adaboost_batch_predict(self):
+        """Tests the adaboost algorithm with batch predictions.
+
+        Tests that predicting every data point at once computes the same weights as predicting each data point.
+
+        """
+        # Create two weighted binary decision trees, and predict every data point at once
+        weights_list, _ = self.adaboost.decision_tree(self.train_data, self.features, self.target,
+                                                      iterations=2,
+                                                      model_dict={"predict_method": self.predict.binary_tree,
+                                                                  "batch_predict_method":
+                                                                      self.predict.binary_tree_batch,
+                                                                  "model": self.weighted_binary_decision_trees,
+                                                                  "model_method": "greedy_recursive",
+                                                                  "model_parameters": {"max_depth": 1,
+                                                                                       "minimum_error": 1e-15,
+                                                                                       "current_depth": 0}})
+
+        # The weights have to equal to [0.15802933659263743, 0.1768236329364191]
+        self.assertEqual([round(i, 5) for i in weights_list],
+                         [round(0.15802933659263743, 5), round(0.1768236329364191, 5)])
+
+    def test_08_greedy_iterative(self):
+        """Tests greedy iterative function for WeightedBinaryDecisionTrees class.
+
+        We will assert that the iterative approach builds the same trees as the recursive approach.
+
+        """
+        # Create data weights, integer weights, normalized weights and random normalized weights
+        for data_weights, max_depth in [(pd.Series([1.] * 10 + [2.] * (len(self.train_data) - 20) + [-1.] * 10), 6),
+                                        (pd.Series([(i % 7 + 1.) / len(self.train_data)
+                                                    for i in range(len(self.train_data))]), 6),
+                                        (pd.Series(np.random.default_rng(0).dirichlet(np.ones(len(self.train_data)))),
+                                         10)]:
+            model_parameters = {"data_weights": data_weights, "current_depth": 0, "max_depth": max_depth,
+                                "minimum_error": 1e-15}
+
+            # Create decision trees with the recursive approach and the iterative approach, and assert they are equal
+            self.assertEqual(self.weighted_binary_decision_trees.greedy_iterative(self.train_data, self.features,
+                                                                                  self.target, model_parameters),
+                             self.weighted_binary_decision_trees.greedy_recursive(self.train_data, self.features,
+                                                                                  self.target, model_parameters))
+
+    def test_09_weighted_label_sums(self):
+        """Tests weighted label sums function for WeightedBinaryDecisionTrees class.
+
+        We will assert that the sums of a child from histogram subtraction are equal to the sums that are computed
+        from the rows of the child.
+
+        """
+        # Split the data on the grade A, and create normalized weights
+        feature_matrix = self.train_data[self.features].values
+        labels = self.train_data[self.target].values
+        data_weights = np.array([(i % 7 + 1.) / len(self.train_data) for i in range(len(self.train_data))])
+        right_rows = self.train_data["grade.A"].values == 1
+
+        # Subtract the sums of the right child from the sums of the node
+        left_sums = self.weighted_binary_decision_trees.weighted_label_sums(feature_matrix, labels, data_weights) - \
+            self.weighted_binary_decision_trees.weighted_label_sums(feature_matrix[right_rows], labels[right_rows],
+                                                                    data_weights[right_rows])
+
+        # Assert that the sums are equal to the sums of the left child
+        self.assertEqual(np.round(left_sums, 10).tolist(),
+                         np.round(self.weighted_binary_decision_trees.weighted_label_sums(
+                             feature_matrix[~right_rows], labels[~right_rows], data_weights[~right_rows]), 10).tolist())
+
+    def test_10_adaboost_training_predictions(self):
+        """Tests the adaboost algorithm with cached training predictions.
+
+        Tests that the cached training predictions are the predictions of each model on the training data.
+
+        """
+        # Create three weighted binary decision trees, and cache their training predictions
+        training_predictions = []
+        weights_list, model_list = self.adaboost.decision_tree(self.train_data, self.features, self.target,
+                                                               iterations=3,
+                                                               model_dict={"predict_method": self.predict.binary_tree,
+                                                                           "batch_predict_method":
+                                                                               self.predict.binary_tree_batch,
+                                                                           "model": self.weighted_binary_decision_trees,
+                                                                           "model_method": "greedy_iterative",
+                                                                           "model_parameters": {"max_depth": 2,
+                                                                                                "minimum_error": 1e-15,
+                                                                                                "current_depth": 0},
+                                                                           "training_predictions":
+                                                                               training_predictions})
+
+        # Assert that there is one weight and one cached prediction per model
+        self.assertEqual(len(weights_list), 3)
+        self.assertEqual(len(training_predictions), 3)
+
+        # Assert that the cached predictions are the predictions of each model
+        for model, predictions in zip(model_list, training_predictions):
+            self.assertEqual(list(predictions), list(self.predict.binary_tree_batch(model, self.train_data)))
+
+    def test_11_compiled_ensemble(self):
+        """Tests compiling an adaboost ensemble into arrays.
+
+        Tests that scoring every data point with the compiled ensemble makes the same predictions as scoring each
+        model.
+
+        """
+        # Create five weighted binary decision trees
+        weights_list, model_list = self.adaboost.decision_tree(self.train_data, self.features, self.target,
+                                                               iterations=5,
+                                                               model_dict={"predict_method": self.predict.binary_tree,
+                                                                           "batch_predict_method":
+                                                                               self.predict.binary_tree_batch,
+                                                                           "model": self.weighted_binary_decision_trees,
+                                                                           "model_method": "greedy_iterative",
+                                                                           "model_parameters": {"max_depth": 3,
+                                                                                                "minimum_error": 1e-15,
+                                                                                                "current_depth": 0}})
+
+        # Assert that the predictions are the same as the predictions of each model
+        self.assertEqual(list(self.predict.adaboost_binary_decision_tree_batch(model_list, weights_list,
+                                                                               self.test_data)),
+                         list(self.predict.adaboost_binary_decision_tree(self.predict.binary_tree, model_list,
+                                                                         weights_list, self.test_data)))
+
+        # Assert that the margins are the sums of the weighted predictions of each model, in small chunks
+        ensemble = CompiledEnsemble().compile(model_list, weights_list, self.features)
+        margins = sum(weight * self.predict.binary_tree_batch(model, self.test_data)
+                      for weight, model in zip(weights_list, model_list))
+        self.assertEqual([round(margin, 5) for margin in ensemble.decision_function(
+                             self.test_data[self.features].values, chunk_size=100)],
+                         [round(margin, 5) for margin in margins])
+        self.assertEqual([round(margin, 5) for margin in self.predict.adaboost_binary_decision_tree_batch(
+                             ensemble, None, self.test_data, margins=True)],
+                         [round(margin, 5) for margin in margins])
+
+    def test_12_adaboost_early_stopping(self):
+        """Tests the adaboost algorithm with staged validation errors and early stopping.
+
+        Tests that the staged validation errors are the errors of each prefix of the ensemble, and that boosting stops
+        when the validation error has not improved.
+
+        """
+        # Create ten weighted binary decision trees, and record the validation error after each iteration
+        validation_errors = []
+        model_dict = {"predict_method": self.predict.binary_tree,
+                      "batch_predict_method": self.predict.binary_tree_batch,
+                      "model": self.weighted_binary_decision_trees,
+                      "model_method": "greedy_iterative",
+                      "model_parameters": {"max_depth": 2, "minimum_error": 1e-15, "current_depth": 0},
+                      "validation_data": self.test_data}
+        weights_list, model_list = self.adaboost.decision_tree(self.train_data, self.features, self.target,
+                                                               iterations=10,
+                                                               model_dict={**model_dict,
+                                                                           "validation_errors": validation_errors})
+
+        # Assert that the validation errors are the errors of the first models of the ensemble
+        self.assertEqual(len(validation_errors), 10)
+        for iteration in range(10):
+            predictions = self.predict.adaboost_binary_decision_tree_batch(model_list[0:iteration + 1],
+                                                                           weights_list[0:iteration + 1],
+                                                                           self.test_data)
+            self.assertEqual(round(validation_errors[iteration], 5),
+                             round(float(np.mean(predictions != self.test_data[self.target])), 5))
+
+        # Stop early after two iterations without improvement, and assert that the models up to the lowest
+        # validation error are kept
+        early_validation_errors = []
+        early_weights_list, _ = self.adaboost.decision_tree(self.train_data, self.features, self.target,
+                                                            iterations=10,
+                                                            model_dict={**model_dict,
+                                                                        "validation_errors": early_validation_errors,
+                                                                        "patience": 2})
+        best_iteration = self.adaboost.best_iteration(early_validation_errors)
+        self.assertEqual(len(early_validation_errors) - 1 - best_iteration, 2)
+        self.assertEqual(early_weights_list, weights_list[0:best_iteration + 1])
+
+    def test_13_greedy_iterative_histogram_subtraction(self):
+        """Tests greedy iterative function with and without histogram subtraction.
+
+        We will assert that subtracting the sums of the children builds the same trees as summing the children
+        directly, with normalized weights as in adaboost.
+
+        """
+        # Create the weights of two adaboost iterations, where the data points that a model predicts correctly are
+        # multiplied by e^-w, and the rest by e^w, and normalize the weights
+        data_weights = np.ones(len(self.train_data))
+        for weight, correct in [(0.15, self.train_data["grade.A"].values == 1),
+                                (0.18, self.train_data[self.target].values == 1)]:
+            data_weights *= np.where(correct, np.exp(-weight), np.exp(weight))
+            data_weights /= np.sum(data_weights)
+
+        # Create decision trees with and without histogram subtraction, and assert they are equal
+        for max_depth in [6, 10]:
+            model_parameters = {"data_weights": pd.Series(data_weights), "current_depth": 0, "max_depth": max_depth,
+                                "minimum_error": 1e-15}
+            self.assertEqual(self.weighted_binary_decision_trees.greedy_iterative(self.train_data, self.features,
+                                                                                  self.target, model_parameters),
+                             self.weighted_binary_decision_trees.greedy_iterative(self.train_data, self.features,
+                                                                                  self.target,
+                                                                                  {**model_parameters,
+                                                                                   "histogram_subtraction": False}))
@@ -137,3 +137,93 @@ class TestWeightedLogisticRegression(unittest.TestCase):
         # Accuracy has to match 0.77612999999999999
         self.assertEqual(round(self.accuracy.general(predictions, sentiment), 5),
                          round(0.77612999999999999, 5))
+
+    def test_03_adaboost_early_stopping(self):
+        """Tests adaboost algorithm with staged validation errors and early stopping.
+
+        Tests that the staged validation errors are the errors of each prefix of the ensemble, and that boosting stops
+        when the validation error has not improved.
+
+        """
+        # We will use important words for the output
+        features = self.important_words
+
+        # Output will use sentiment
+        output = ['sentiment']
+
+        # Convert our pandas frame to numpy, and use the last 20% of the data for validation
+        feature_matrix, sentiment = self.convert_numpy.convert_to_numpy(self.review_frame, features, output, 1)
+        num_train = int(len(feature_matrix) * 0.8)
+
+        # Create 5 weighted logistic regression, and record the validation error after each iteration
+        validation_errors = []
+        model_dict = {"predict_method": self.predict.logistic_regression,
+                      "model": self.weighted_logistic_regression,
+                      "model_method": "gradient_ascent",
+                      "model_parameters": {"step_size": 1e-7, "max_iter": 30, "initial_coefficients": np.zeros(194)},
+                      "validation_feature_matrix": feature_matrix[num_train:],
+                      "validation_label": sentiment[num_train:]}
+        weights, models = self.ada.logistic_regression(feature_matrix[0:num_train], sentiment[0:num_train],
+                                                       iterations=5,
+                                                       model_dict={**model_dict,
+                                                                   "validation_errors": validation_errors})
+
+        # Assert that the validation errors are the errors of the first models of the ensemble
+        self.assertEqual(len(validation_errors), 5)
+        for iteration in range(5):
+            predictions = self.predict.adaboost_logistic_regression(self.predict.logistic_regression,
+                                                                    models[0:iteration + 1], weights[0:iteration + 1],
+                                                                    feature_matrix[num_train:])
+            self.assertEqual(round(validation_errors[iteration], 5),
+                             round(1 - self.accuracy.general(predictions, sentiment[num_train:]), 5))
+
+        # Stop early after one iteration without improvement, and assert that the models up to the lowest validation
+        # error are kept
+        early_validation_errors = []
+        early_weights, _ = self.ada.logistic_regression(feature_matrix[0:num_train], sentiment[0:num_train],
+                                                        iterations=5,
+                                                        model_dict={**model_dict,
+                                                                    "validation_errors": early_validation_errors,
+                                                                    "patience": 1})
+        best_iteration = self.ada.best_iteration(early_validation_errors)
+        self.assertEqual(early_weights, weights[0:best_iteration + 1])
+
+    def test_04_adaboost_warm_start(self):
+        """Tests adaboost algorithm with warm started models.
+
+        Tests that each model starts from the coefficients of the previous model, with the iterations of one round.
+
+        """
+        # We will use important words for the output
+        features = self.important_words
+
+        # Output will use sentiment
+        output = ['sentiment']
+
+        # Convert our pandas frame to numpy
+        feature_matrix, sentiment = self.convert_numpy.convert_to_numpy(self.review_frame, features, output, 1)
+
+        # Create 2 weighted logistic regression, where the second model refines the first model for 5 iterations
+        weights, models = self.ada.logistic_regression(feature_matrix, sentiment,
+                                                       iterations=2,
+                                                       model_dict={"predict_method": self.predict.logistic_regression,
+                                                                   "model": self.weighted_logistic_regression,
+                                                                   "model_method": "gradient_ascent",
+                                                                   "model_parameters": {"step_size": 1e-7,
+                                                                                        "max_iter": 30,
+                                                                                        "initial_coefficients":
+                                                                                            np.zeros(194)},
+                                                                   "warm_start": True,
+                                                                   "round_max_iter": 5})
+
+        # Compute the data weights of the second model from the weight of the first model
+        correct = self.predict.logistic_regression(feature_matrix, models[0]) == sentiment
+        data_weights = np.where(correct, np.exp(-weights[0]), np.exp(weights[0]))
+        data_weights = data_weights / np.sum(data_weights)
+
+        # Assert that the second model is the first model after 5 more iterations
+        coefficients = self.weighted_logistic_regression.gradient_ascent(feature_matrix, sentiment,
+                                                                         {"initial_coefficients": models[0],
+                                                                          "weights_list": data_weights,
+                                                                          "step_size": 1e-7, "max_iter": 5})
+        self.assertEqual([round(i, 5) for i in models[1]], [round(i, 5) for i in coefficients])
@@ -1,9 +1,19 @@
 """Implements NearestNeighbor Unittest."""
 
+import gzip
+import os
+import tempfile
 import unittest
 import json
+from collections import Counter
+from multiprocessing import Pool
+import numpy as np
 import pandas as pd
+from scipy.sparse import vstack
 from data_extraction import text_analytics
+from data_extraction.corpus_reader import CorpusReader
+from data_extraction.text_analytics import TextAnalytics
+from data_extraction.tokenizer import Tokenizer
 from machine_learning.clustering import nearest_neighbor
 
 
@@ -96,3 +106,376 @@ class TestNearestNeighbor(unittest.TestCase):
 
         # Assert that these two numbers are equal
         self.assertEqual(round(distance, 5), round(0.703138676734, 5))
+
+    def test_04_distance_matrix(self):
+        """Test the sparse distance matrix.
+
+        Test that the blocked sparse distances are equal to the distances computed on dictionaries.
+
+        """
+        # Reduce the frame
+        frame = self.wiki[self.wiki["name"].isin(["Barack Obama", "George W. Bush", "Joe Biden", "Bill Clinton"])]
+
+        for feature, distance in [("word_count", "euclidean"), ("tf_idf", "cosine_similarity")]:
+            # Convert the dictionaries to a csr matrix, and compute the distances with a small block size so that
+            # more than one block is computed
+            feature_matrix, _ = self.nearest_neighbor.convert_sparse.convert_to_csr(frame[feature])
+            distances = self.nearest_neighbor.distance_matrix(feature_matrix, feature_matrix, distance, block_size=3)
+
+            # Assert that each distance is equal to the distance computed on the dictionaries
+            for i, target in enumerate(frame[feature]):
+                for j, compare in enumerate(frame[feature]):
+                    self.assertEqual(round(distances[i, j], 5),
+                                     round(getattr(self.nearest_neighbor, distance)(target, compare), 5))
+
+    def test_05_top_k(self):
+        """Test the top k nearest neighbors.
+
+        Test that only the k nearest references are kept for each query, and compare it to known values.
+
+        """
+        # Reduce the frame
+        frame = self.wiki[self.wiki["name"].isin(["Barack Obama", "George W. Bush", "Joe Biden", "Bill Clinton"])]
+
+        # Get a pandas frame of the two nearest neighbors of each query
+        neighbors = self.nearest_neighbor.nearest_neighbors(frame, "name", "word_count", "euclidean", top_k=2)
+
+        # Assert that two neighbors are kept for each query
+        self.assertEqual(len(neighbors), 2 * len(frame))
+
+        # The nearest neighbor of a query is itself
+        obama = neighbors[neighbors["query_label"] == "Barack Obama"]
+        self.assertEqual(obama.iloc[0]["reference_label"], "Barack Obama")
+        self.assertEqual(round(obama.iloc[0]["distance"], 5), 0.0)
+
+        # Assert that the neighbors are sorted by distance
+        self.assertLessEqual(obama.iloc[0]["distance"], obama.iloc[1]["distance"])
+
+    def test_06_cosine_similarity_candidates(self):
+        """Test cosine similarity with an inverted index.
+
+        Test that scoring only the candidates from the inverted index gives the same nearest neighbors as scoring
+        every pair.
+
+        """
+        # Reduce the frame
+        frame = self.wiki[self.wiki["name"].isin(["Barack Obama", "George W. Bush", "Joe Biden", "Bill Clinton"])]
+
+        # Convert the tf idf dictionaries to a csr matrix
+        feature_matrix, _ = self.nearest_neighbor.convert_sparse.convert_to_csr(frame["tf_idf"])
+
+        # Compute the nearest neighbors with the inverted index, and the distances of every pair
+        _, _, distances = self.nearest_neighbor.k_nearest_neighbors(feature_matrix, feature_matrix,
+                                                                    "cosine_similarity", 3)
+        distance_matrix = self.nearest_neighbor.distance_matrix(feature_matrix, feature_matrix, "cosine_similarity")
+
+        # Assert that the distances are the 3 smallest distances of every pair
+        self.assertEqual([round(distance, 5) for distance in distances],
+                         [round(distance, 5) for distance in np.sort(distance_matrix, axis=1)[:, 0:3].ravel()])
+
+    def test_07_parallel_nearest_neighbors(self):
+        """Test nearest neighbors computed with worker processes.
+
+        Test that computing the blocks with worker processes gives the same results as computing them in one process,
+        and that the progress of each block is reported.
+
+        """
+        # Reduce the frame
+        frame = self.wiki[self.wiki["name"].isin(["Barack Obama", "George W. Bush", "Joe Biden", "Bill Clinton"])]
+
+        # Convert the word count dictionaries to a csr matrix
+        feature_matrix, _ = self.nearest_neighbor.convert_sparse.convert_to_csr(frame["word_count"])
+
+        for distance in ["euclidean", "cosine_similarity"]:
+            # Store the progress of each block
+            progress = []
+
+            # Compute the nearest neighbors in one process, and with two worker processes
+            expected = self.nearest_neighbor.k_nearest_neighbors(feature_matrix, feature_matrix, distance, 2)
+            result = self.nearest_neighbor.k_nearest_neighbors_parallel(feature_matrix, feature_matrix, distance, 2,
+                                                                        {"block_size": 1, "processes": 2,
+                                                                         "progress": progress.append})
+
+            # Assert that the results are equal
+            self.assertEqual([list(array) for array in result], [list(array) for array in expected])
+
+            # Assert that every block reported its progress
+            self.assertEqual(sorted([block["block"] for block in progress]), list(range(len(frame))))
+
+    def test_08_fit_document_frequency(self):
+        """Test the document frequency table.
+
+        Test that fit counts the documents that use each word, and that tf idf uses the table.
+
+        """
+        # Create corpus
+        corpus = pd.Series(["the quick brown fox jumps over lazy dog", "a quick brown dog outpaces a quick fox"])
+
+        # Build the document frequency table
+        self.text_analytics.fit(corpus)
+
+        # Assert the number of documents that use a word
+        self.assertEqual(self.text_analytics.corpus_size, 2)
+        self.assertEqual(self.text_analytics.document_frequency[self.text_analytics.vocabulary["quick"]], 2)
+        self.assertEqual(self.text_analytics.document_frequency[self.text_analytics.vocabulary["a"]], 1)
+
+        # Assert with known values, where "a" is used twice in the second document
+        tf_idf = self.text_analytics.tf_idf(corpus, corpus[1])
+        self.assertEqual(round(tf_idf["a"], 5), round(1.3862943611198906, 5))
+        self.assertEqual(round(tf_idf["quick"], 5), 0.0)
+
+    def test_09_tf_idf_matrix(self):
+        """Test tf idf matrix.
+
+        Test that the tf idf matrix of a corpus is equal to the tf idf of each document.
+
+        """
+        # Create corpus
+        corpus = pd.Series(["the quick brown fox jumps over lazy dog", "a quick brown dog outpaces a quick fox"])
+
+        # Compute the tf idf matrix of the whole corpus
+        tf_idf_matrix = self.text_analytics.tf_idf_matrix(corpus)
+
+        # Assert that there is one row per document, and one column per word
+        self.assertEqual(tf_idf_matrix.shape, (2, 10))
+
+        # Assert that each row is equal to the tf idf of the document
+        for row, document in enumerate(corpus):
+            for word, value in self.text_analytics.tf_idf(corpus, document).items():
+                self.assertEqual(round(tf_idf_matrix[row, self.text_analytics.vocabulary[word]], 5), round(value, 5))
+
+    def test_10_hashing_matrix(self):
+        """Test hashing matrix.
+
+        Test that the hashed word counts match the word counts of each document.
+
+        """
+        # Create corpus
+        corpus = pd.Series(["the quick brown fox jumps over lazy dog", "a quick brown dog outpaces a quick fox"])
+
+        # Compute the hashed word counts with a large amount of columns, so that the words don't collide
+        hashing_matrix = self.text_analytics.hashing_matrix(corpus, n_features=2 ** 20)
+
+        # Assert that each word is counted in the column of its hash
+        for row, document in enumerate(corpus):
+            for word, count in self.text_analytics.word_count(document).items():
+                column, _ = self.text_analytics.hash_word(word, 2 ** 20)
+                self.assertEqual(hashing_matrix[row, column], count)
+
+        # Assert that the amount of columns is bounded, and that no vocabulary is stored
+        self.assertEqual(self.text_analytics.hashing_matrix(corpus, n_features=8, signed=True).shape, (2, 8))
+        self.assertEqual(self.text_analytics.vocabulary, {})
+
+    def test_11_parallel_fit(self):
+        """Test fitting the document frequencies with worker processes.
+
+        Test that the tokenizer is applied to every document, and that the document frequencies are the same with
+        worker processes as in one process.
+
+        """
+        # Create a text analytics that lowercases, splits on letters, and removes stop words
+        text_analytics = TextAnalytics(Tokenizer(pattern="[a-z]+", lowercase=True, stop_words=["the", "a"]))
+
+        # Create corpus
+        corpus = pd.Series(["The quick, brown fox jumps over the lazy dog.", "A quick brown dog outpaces a quick fox!",
+                            "The dog sleeps."])
+
+        # Assert the word count with the tokenizer
+        self.assertEqual(dict(TextAnalytics.word_count(corpus[1], text_analytics.tokenizer)),
+                         {"quick": 2, "brown": 1, "dog": 1, "outpaces": 1, "fox": 1})
+
+        # Fit with one process, and with two worker processes
+        vocabulary = dict(text_analytics.fit(corpus).vocabulary)
+        document_frequency = list(text_analytics.document_frequency)
+        text_analytics.fit(corpus, processes=2)
+
+        # Assert that the vocabulary and document frequencies are the same
+        self.assertEqual(text_analytics.vocabulary, vocabulary)
+        self.assertEqual(list(text_analytics.document_frequency), document_frequency)
+        self.assertEqual(text_analytics.document_frequency[text_analytics.vocabulary["dog"]], 3)
+
+    def test_12_save_load_partial_fit(self):
+        """Test saving, loading and updating the document frequency table.
+
+        Test that a loaded table is equal to the saved table, and that updating the table with new documents is equal
+        to fitting all of the documents.
+
+        """
+        # Create corpus, and new documents
+        corpus = pd.Series(["the quick brown fox jumps over lazy dog", "a quick brown dog outpaces a quick fox"])
+        new_documents = pd.Series(["the lazy fox sleeps", "a dog barks"])
+
+        # Fit the corpus, and save it to a temporary file
+        self.text_analytics.fit(corpus)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "idf.bin")
+            self.text_analytics.save(path)
+
+            # Load the table, and assert that it's equal to the saved table
+            loaded = TextAnalytics().load(path)
+            self.assertEqual(loaded.vocabulary, self.text_analytics.vocabulary)
+            self.assertEqual(list(loaded.document_frequency), list(self.text_analytics.document_frequency))
+            self.assertEqual(loaded.corpus_size, 2)
+
+            # Update the loaded table with new documents
+            loaded.partial_fit(new_documents)
+
+        # Assert that the updated table is equal to fitting all of the documents
+        fitted = TextAnalytics().fit(pd.concat([corpus, new_documents], ignore_index=True))
+        self.assertEqual(loaded.vocabulary, fitted.vocabulary)
+        self.assertEqual(list(loaded.document_frequency), list(fitted.document_frequency))
+        self.assertEqual(loaded.corpus_size, 4)
+        self.assertEqual(round(loaded.idf["fox"], 5), round(fitted.idf["fox"], 5))
+
+    def test_13_stream_tf_idf(self):
+        """Test fitting and transforming a compressed corpus in chunks.
+
+        Test that fitting and transforming the chunks of a compressed text file is equal to fitting and transforming
+        the whole corpus.
+
+        """
+        # Create corpus, and write it to a compressed text file, one document per line
+        corpus = pd.Series(["the quick brown fox", "a lazy dog", "the dog and the fox", "quick quick fox", "x y z"])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "corpus.txt.gz")
+            with gzip.open(path, "wt") as file:
+                file.write("\n".join(corpus) + "\n")
+
+            # Fit the chunks in a first pass, and transform the chunks in a second pass
+            corpus_reader = CorpusReader(chunk_size=2)
+            self.assertEqual([len(chunk) for chunk in corpus_reader.read_text(path)], [2, 2, 1])
+            self.text_analytics.fit_stream(corpus_reader.read_text(path))
+            tf_idf = vstack(list(self.text_analytics.tf_idf_matrix_stream(corpus_reader.read_text(path))))
+
+        # Assert that the chunks are equal to the whole corpus
+        fitted = TextAnalytics().fit(corpus)
+        self.assertEqual(self.text_analytics.vocabulary, fitted.vocabulary)
+        self.assertEqual(self.text_analytics.corpus_size, 5)
+        self.assertEqual(round(abs(tf_idf - fitted.tf_idf_matrix(corpus)).max(), 5), 0)
+
+    def test_14_save_load_empty(self):
+        """Test saving and loading an empty document frequency table.
+
+        Test that a table without words is loaded as an empty table.
+
+        """
+        # Save an empty table to a temporary file, and load it
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "idf.bin")
+            TextAnalytics().save(path)
+            loaded = TextAnalytics().load(path)
+
+        # Assert that the loaded table is empty
+        self.assertEqual(loaded.vocabulary, {})
+        self.assertEqual(list(loaded.document_frequency), [])
+        self.assertEqual(loaded.corpus_size, 0)
+
+    def test_15_tf_idf_unknown_words(self):
+        """Test tf idf of a document with words that are not in the fitted corpus.
+
+        Test that unknown words are skipped, and that the fitted corpus is used.
+
+        """
+        # Create corpus
+        corpus = pd.Series(["the quick brown fox", "the lazy dog"])
+
+        # Compute the tf idf of a document with an unknown word
+        tf_idf = self.text_analytics.tf_idf(corpus, "the quick cat")
+
+        # Assert that the unknown word is skipped
+        self.assertEqual(sorted(tf_idf), ["quick", "the"])
+        self.assertEqual(round(tf_idf["quick"], 5), round(np.log(2.), 5))
+        self.assertEqual(round(tf_idf["the"], 5), 0.)
+
+    def test_16_static_word_count(self):
+        """Test word count without an instance of TextAnalytics.
+
+        Test that the static word count splits on a single space, and that a tokenizer can be given.
+
+        """
+        # Assert the word count with the default tokenizer, and with a tokenizer that lowercases
+        self.assertEqual(dict(TextAnalytics.word_count("the dog and the Dog")), {"the": 2, "dog": 1, "and": 1,
+                                                                                 "Dog": 1})
+        self.assertEqual(dict(TextAnalytics.word_count("the dog and the Dog", Tokenizer(lowercase=True))),
+                         {"the": 2, "dog": 2, "and": 1})
+
+    def test_17_count_corpus_processes(self):
+        """Test counting with more processes than documents, an empty corpus, and an invalid amount of processes.
+
+        Test that an empty corpus gives empty counts with any amount of processes, that more processes than
+        documents give the same counts as one process, and that less than one process raises a ValueError.
+
+        """
+        # Create corpus
+        corpus = pd.Series(["the quick brown fox", "the lazy dog"])
+
+        # Assert that an empty corpus gives empty counts
+        self.assertEqual(self.text_analytics.count_corpus(pd.Series([], dtype=str), processes=2),
+                         (Counter(), Counter()))
+
+        # Assert that more processes than documents give the same counts as one process
+        self.assertEqual(self.text_analytics.count_corpus(corpus, processes=4),
+                         self.text_analytics.count_corpus(corpus))
+
+        # Assert that less than one process raises a ValueError
+        for processes in [0, -1, None]:
+            with self.assertRaises(ValueError):
+                self.text_analytics.count_corpus(corpus, processes=processes)
+
+    def test_18_stream_fit_processes(self):
+        """Test fitting chunks with worker processes that are shared by every chunk.
+
+        Test that fitting the chunks with worker processes, and updating the table with a given pool, are equal to
+        fitting the whole corpus in one process.
+
+        """
+        # Create corpus, and split it into chunks
+        corpus = pd.Series(["the quick brown fox", "a lazy dog", "the dog and the fox", "quick quick fox", "x y z"])
+        chunks = [corpus[0:2], corpus[2:4], corpus[4:5]]
+
+        # Fit the chunks with two worker processes
+        self.text_analytics.fit_stream(chunks, processes=2)
+
+        # Assert that the chunks are equal to the whole corpus
+        fitted = TextAnalytics().fit(corpus)
+        self.assertEqual(self.text_analytics.vocabulary, fitted.vocabulary)
+        self.assertEqual(list(self.text_analytics.document_frequency), list(fitted.document_frequency))
+        self.assertEqual(self.text_analytics.corpus_size, 5)
+
+        # Assert that updating the table with a given pool is equal to fitting the whole corpus
+        with Pool(2) as pool:
+            self.text_analytics.reset()
+            for chunk in chunks:
+                self.text_analytics.partial_fit(chunk, processes=2, pool=pool)
+        self.assertEqual(list(self.text_analytics.document_frequency), list(fitted.document_frequency))
+
+    def test_19_read_csv_empty_cells(self):
+        """Test reading a csv file with empty documents.
+
+        Test that empty cells are read as empty documents, which can be fitted.
+
+        """
+        # Write a csv file with an empty document
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "corpus.csv")
+            frame = pd.DataFrame({"name": ["a", "b", "c"], "text": ["the quick fox", None, "the dog"]})
+            frame.to_csv(path, index=False)
+
+            # Read the documents, and fit them
+            chunks = list(CorpusReader(chunk_size=2).read_csv(path, "text"))
+            self.text_analytics.fit_stream(chunks)
+
+        # Assert that the empty cell is an empty document
+        self.assertEqual([list(chunk) for chunk in chunks], [["the quick fox", ""], ["the dog"]])
+        self.assertEqual(self.text_analytics.corpus_size, 3)
+        self.assertEqual(self.text_analytics.document_frequency[self.text_analytics.vocabulary["the"]], 2)
+
+    def test_20_stream_not_fitted(self):
+        """Test transforming a stream without a fitted document frequency table.
+
+        Test that the ValueError is raised when the stream is created, before any chunk is read.
+
+        """
+        # Assert that creating the stream raises, without reading the chunks
+        with self.assertRaises(ValueError):
+            self.text_analytics.tf_idf_matrix_stream([pd.Series(["the quick fox"])])
@@ -282,3 +282,57 @@ class TestKNearestNeighborRegression(unittest.TestCase):
         # Assert that the lowest k and rss is correct
         self.assertEqual(round(low_rss, -13), round(6.73616787355e+13, -13))
         self.assertEqual(low_idx, 8)
+
+    def test_04_compute_weighted_knn(self):
+        """Tests distance weighted and kernel knn regression.
+
+        Tests the distance, gaussian and epanechnikov weightings and compare them with known values.
+
+        """
+        # List of features to convert to numpy
+        feature_list = ['bedrooms',
+                        'bathrooms',
+                        'sqft_living',
+                        'sqft_lot',
+                        'floors',
+                        'waterfront',
+                        'view',
+                        'condition',
+                        'grade',
+                        'sqft_above',
+                        'sqft_basement',
+                        'yr_built',
+                        'yr_renovated',
+                        'lat',
+                        'long',
+                        'sqft_living15',
+                        'sqft_lot15']
+
+        # Output to convert to numpy
+        output = ['price']
+
+        # Extract features and output for train and validation set
+        features_train, output_train = self.convert_numpy.convert_to_numpy(self.kc_house_train, feature_list, output, 1)
+        features_valid, output_valid = self.convert_numpy.convert_to_numpy(self.kc_house_valid, feature_list, output, 1)
+
+        # Normalize our training features, and then normalize the valid set
+        features_train, norms = self.normalize_features.l2_norm(features_train)
+        features_valid = features_valid / norms
+
+        # Known predictions for the first validation house, and known RSS for the whole validation set
+        known_values = {"mean": (423812.5, 6.86955895131e+13),
+                        "distance": (429128.7712168775, 6.81969090142e+13),
+                        "gaussian": (428029.8997985115, 6.82449188927e+13),
+                        "epanechnikov": (466530.9039979231, 6.99049871758e+13)}
+
+        for weighting, (prediction, rss) in known_values.items():
+            # Assert the prediction of a single query point
+            self.assertEqual(round(self.knn.predict_k_nearest_neighbor_regression(8, features_train, output_train,
+                                                                                  features_valid[0], weighting), 5),
+                             round(prediction, 5))
+
+            # Predict the whole validation set in one batch, and compute the RSS
+            predictions = self.knn.predict_k_nearest_neighbor_all_regression(8, features_train, output_train,
+                                                                             features_valid, weighting)
+            self.assertEqual(round(np.dot(output_valid - predictions, output_valid - predictions), -10),
+                             round(rss, -10))